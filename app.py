@@ -1,24 +1,90 @@
 #app.py
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from flask_login import LoginManager
 import os
+from functools import partial
+from flask import Flask
+from sqlalchemy import event
+
+from config import Config, load_secret_key
+from extensions import db, migrate, login_manager, assets, template_cache, event_hub, compression, health_shards, jobs
+from responses import FastJSONProvider
+
+
+def set_sqlite_pragma(busy_timeout_ms, dbapi_connection, connection_record):
+    """複数ワーカーからの同時アクセスに備えて WAL モードとロック待ちを設定"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout_ms)}')
+    cursor.close()
+
+
+def create_app(config=None, web=True):
+    """アプリケーションを作成する
+
+    config: Config を上書きする設定（テストやベンチマーク用）
+    web: False の場合は画面・API のルーティング（routes・forms）を読み込まない
+         （ジョブのワーカー・CLI・テストデータの登録など、リクエストを処理しない場合の起動を速くする）
+    """
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    if config:
+        app.config.update(config)
+
+    if not app.config['SECRET_KEY']:
+        # ワーカーごとに異なる鍵にならないよう、インスタンスフォルダに保存した鍵を共有する
+        app.config['SECRET_KEY'] = load_secret_key(os.path.join(app.instance_path, 'secret_key'))
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.urandom(24)  # セキュリティキーを設定
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///your_database.db'  # 適切なデータベースを設定
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.json = FastJSONProvider(app)
 
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-login_manager = LoginManager(app)
+    db.init_app(app)
+    migrate.init_app(app, db)
+    login_manager.init_app(app)
+    assets.init_app(app)
+    template_cache.init_app(app)
+    event_hub.init_app(app)
+    compression.init_app(app)
+    health_shards.init_app(app)
+    jobs.init_app(app)
 
-# ルーティングのインポート
-from routes import *
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', partial(set_sqlite_pragma, app.config['SQLITE_BUSY_TIMEOUT_MS']))
 
-# アプリケーションの実行
+    # 社員・体調記録の変更を変更フィード用に記録する
+    from changefeed import init_change_log
+    init_change_log()
+
+    # ルーティングの登録
+    if web:
+        from routes import bp
+        app.register_blueprint(bp)
+
+    # バックグラウンドジョブの登録（ワーカープロセスでも create_app で登録される）
+    import bulk_ops, exports  # noqa: F401
+
+    # 締め時刻の設定を起動時に検証する（形式が正しくない場合は起動しない）
+    from reminders import parse_cutoffs
+    try:
+        parse_cutoffs(app.config['REMINDER_CUTOFFS'])
+    except ValueError:
+        raise RuntimeError(f'REMINDER_CUTOFFS の形式が正しくありません（HH:MM のカンマ区切り）: {app.config["REMINDER_CUTOFFS"]!r}')
+
+    # CLI コマンドの登録
+    from bulk_ops import retire_employees_command
+    from sharding import shard_health_records_command
+    from daily_records import dedupe_health_records_command
+    from reminders import snapshot_unregistered_command
+    app.cli.add_command(retire_employees_command)
+    app.cli.add_command(shard_health_records_command)
+    app.cli.add_command(dedupe_health_records_command)
+    app.cli.add_command(snapshot_unregistered_command)
+
+    return app
+
+
+# アプリケーションの実行（開発用。本番は wsgi.py を gunicorn で起動する）
 if __name__ == '__main__':
     debug = False
+    app = create_app()
+    with app.app_context():
+        jobs.recover()  # 停止したジョブを再開する
     app.run(host='0.0.0.0', port=8080, debug=debug)
-
@@ -0,0 +1,84 @@
+# assets.py
+import json
+import mimetypes
+import os
+from flask import request, send_from_directory, url_for, abort
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')  # ビルド済みアセットの出力先
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+
+# 外部ライブラリ（static/vendor にコミットする。工場内のネットワークからは CDN に接続できないため）
+# 実際に取り込んだ取得元（アーカイブの場合は member）と SHA-256 を固定し、build_assets.py でファイルの有無と内容を確認する
+VENDOR_ASSETS = {
+    # Chart.js 4.4.0 の UMD 版（最小化済み）。django-unfold 0.91.0 の wheel に同梱されたもの
+    'vendor/chart.umd.min.js': {
+        'url': 'https://files.pythonhosted.org/packages/cb/e8/2591119368628867284550ee5c337bae1f4b4c0e5a8a59f231899326a26f/'
+               'django_unfold-0.91.0-py3-none-any.whl',
+        'member': 'unfold/static/unfold/js/chart/chart.js',
+        'sha256': 'db65ba70511147e08494c38a46030c89cb9e3153f455fec50440581fc67cb429',
+    },
+}
+
+# ハッシュ付きファイルは内容が変わると名前も変わるため、長期間キャッシュさせる
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# 事前圧縮ファイルの拡張子（優先順）
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """論理ファイル名 → ハッシュ付きファイル名の対応表を読み込む"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+class Assets:
+    """ハッシュ付き・事前圧縮済みの静的ファイルを配信する"""
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        missing = [filename for filename in VENDOR_ASSETS if not os.path.isfile(os.path.join(STATIC_DIR, filename))]
+        if missing:
+            raise RuntimeError(f'外部ライブラリがありません: {", ".join(missing)}（static/vendor を確認してください）')
+        self.manifest = load_manifest()
+        if not self.manifest:
+            app.logger.info('アセットのマニフェストがありません。static をそのまま配信します。')
+        app.add_url_rule('/assets/<path:filename>', 'assets', self.serve)
+        app.jinja_env.globals['asset_url'] = self.url
+        app.extensions['assets'] = self
+
+    def url(self, filename):
+        """テンプレート用: ビルド済みならハッシュ付きURLを返す"""
+        hashed = self.manifest.get(filename)
+        if hashed:
+            return url_for('assets', filename=hashed)
+        if filename in VENDOR_ASSETS and not os.path.isfile(os.path.join(STATIC_DIR, filename)):
+            raise RuntimeError(f'外部ライブラリ {filename} がありません（static/vendor を確認してください）')
+        return url_for('static', filename=filename)  # 外部ライブラリも static/vendor から配信する（CDN は使わない）
+
+    def serve(self, filename):
+        """ハッシュ付きファイルを、対応していれば br / gzip の事前圧縮版で返す"""
+        if filename.endswith(('.br', '.gz')) or filename == 'manifest.json':
+            abort(404)
+
+        accept_encoding = request.headers.get('Accept-Encoding', '')
+        for encoding, suffix in PRECOMPRESSED:
+            if encoding in accept_encoding and os.path.isfile(os.path.join(DIST_DIR, filename + suffix)):
+                mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                response = send_from_directory(DIST_DIR, filename + suffix, mimetype=mimetype)
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(DIST_DIR, filename)
+
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        response.vary.add('Accept-Encoding')
+        return response
@@ -0,0 +1,92 @@
+# bench_json.py
+"""JSON レスポンスのサイズとシリアライズ時間の比較
+
+3か月分の体調記録（既定: 200人 × 90日）を、行形式 / 列形式、
+Flask 標準の JSON / FastJSONProvider、非圧縮 / gzip / brotli で比較する。
+
+    python bench_json.py [--employees 200] [--days 90] [--repeat 5]
+"""
+import argparse
+import gzip
+import random
+import time
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from responses import FastJSONProvider, brotli, columnar, orjson
+from routes import SYMPTOM_LABELS
+
+
+def make_records(employees, days):
+    records = []
+    for user_id in range(employees):
+        for day in range(days):
+            unwell = random.random() < 0.05
+            records.append({
+                'temperature': round(random.uniform(37.3, 38.5) if unwell else random.uniform(36.0, 36.9), 1),
+                'throat': 'sore' if unwell else 'normal',
+                'fever': 'normal',
+                'cough': 'no',
+                'selected_parts': '',
+                'date': f'2024-{1 + day // 30:02}-{1 + day % 30:02} 08:{user_id % 60:02}:00',
+            })
+    return records
+
+
+def row_format(records):
+    """現行の /api/health_record と同じ行形式（ラベルを毎行繰り返す）"""
+    return [{
+        'temperature': r['temperature'],
+        'throat': "ない" if r['throat'] == "normal" else "痛い",
+        'fever': "ない" if r['fever'] == "normal" else "高い",
+        'cough': "ない" if r['cough'] == "no" else "ある",
+        'selected_parts': r['selected_parts'] or 'なし',
+        'date': r['date'],
+    } for r in records]
+
+
+def columnar_format(records):
+    columns = ['temperature', *SYMPTOM_LABELS, 'selected_parts', 'date']
+    rows = [
+        [r['temperature'],
+         *(0 if r[column] == normal_value else 1 for column, (normal_value, _) in SYMPTOM_LABELS.items()),
+         r['selected_parts'], r['date']]
+        for r in records
+    ]
+    return columnar(columns, rows, {column: labels for column, (_, labels) in SYMPTOM_LABELS.items()})
+
+
+def measure(provider, body, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        data = provider.dumps(body).encode('utf-8')
+    return data, (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON レスポンスの比較')
+    parser.add_argument('--employees', type=int, default=200)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    providers = {'標準 json': DefaultJSONProvider(app), 'FastJSON': FastJSONProvider(app)}
+    records = make_records(args.employees, args.days)
+    bodies = {'行形式': row_format(records), '列形式': columnar_format(records)}
+
+    # 計測した実装（orjson / brotli がない環境では FastJSON は標準の json、brotli の列は 0 になる）
+    json_backend = f'orjson {orjson.__version__}' if orjson else '標準 json（orjson 未インストール）'
+    brotli_backend = f'brotli {brotli.__version__}' if brotli else 'なし（brotli 未インストール）'
+    print(f'{len(records)} 件（FastJSON の実装: {json_backend}、brotli: {brotli_backend}）')
+    print(f'{"形式":<8}{"エンコーダ":<12}{"時間":>10}{"非圧縮":>12}{"gzip":>12}{"brotli":>12}')
+    for body_name, body in bodies.items():
+        for provider_name, provider in providers.items():
+            data, elapsed = measure(provider, body, args.repeat)
+            gzip_size = len(gzip.compress(data, compresslevel=6))
+            brotli_size = len(brotli.compress(data, quality=5)) if brotli else 0
+            print(f'{body_name:<8}{provider_name:<12}{elapsed:>8.1f}ms{len(data):>12,}{gzip_size:>12,}{brotli_size:>12,}')
+
+
+if __name__ == '__main__':
+    main()
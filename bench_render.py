@@ -0,0 +1,90 @@
+# bench_render.py
+"""テンプレート描画のベンチマーク
+
+フラグメントキャッシュ・バイトコードキャッシュの有無で
+register_health / login_form / view_employee の描画時間を比較する。
+
+    python bench_render.py [--repeat 200] [--rows 200]
+"""
+import argparse
+import time
+from collections import namedtuple
+from flask import render_template
+from flask_login import login_user
+
+from app import create_app
+from forms import LoginForm
+from models import User
+from template_cache import FragmentCache
+
+TEMPLATES = ['register_health.html', 'login_form.html', 'view_employee.html']
+
+EmployeeRow = namedtuple('EmployeeRow', 'id employee_number department name flag department_name')
+
+
+def make_employees(rows):
+    return [
+        EmployeeRow(i, f'EMP{i:05}', 'it', f'社員 {i}', i % 3, 'IT部門')
+        for i in range(1, rows + 1)
+    ]
+
+
+def render(name, employees):
+    if name == 'login_form.html':
+        return render_template(name, form=LoginForm())
+    if name == 'view_employee.html':
+        return render_template(name, employees=employees, today='2024-01-01', filter_option='all')
+    return render_template(name)
+
+
+def time_renders(name, employees, repeat):
+    render(name, employees)  # テンプレートの読み込みとキャッシュの作成
+    started = time.perf_counter()
+    for _ in range(repeat):
+        render(name, employees)
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def time_compile(env, bytecode_cache):
+    """全テンプレートを読み込み直す時間（ワーカー起動直後を想定）"""
+    saved = env.bytecode_cache
+    env.bytecode_cache = bytecode_cache
+    try:
+        env.cache.clear()
+        started = time.perf_counter()
+        for name in env.list_templates():
+            if name.endswith('.html'):
+                env.get_template(name)
+        return (time.perf_counter() - started) * 1000
+    finally:
+        env.bytecode_cache = saved
+
+
+def main():
+    parser = argparse.ArgumentParser(description='テンプレート描画のベンチマーク')
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--rows', type=int, default=200, help='view_employee の行数')
+    args = parser.parse_args()
+
+    app = create_app({'WTF_CSRF_ENABLED': False})
+    employees = make_employees(args.rows)
+    env = app.jinja_env
+
+    with app.test_request_context():
+        login_user(User(id=1, name='bench', is_admin=True))
+
+        print(f'{"テンプレート":<24}{"キャッシュなし":>14}{"キャッシュあり":>14}')
+        for name in TEMPLATES:
+            env.fragment_cache = None
+            uncached = time_renders(name, employees, args.repeat)
+            env.fragment_cache = FragmentCache(app.config['FRAGMENT_CACHE_SIZE'])
+            cached = time_renders(name, employees, args.repeat)
+            print(f'{name:<24}{uncached:>12.3f}ms{cached:>12.3f}ms')
+
+        time_compile(env, env.bytecode_cache)  # バイトコードキャッシュを作成
+        print(f'テンプレート読み込み: コンパイル {time_compile(env, None):.1f}ms / '
+              f'バイトコードキャッシュ {time_compile(env, env.bytecode_cache):.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
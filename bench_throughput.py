@@ -0,0 +1,151 @@
+# bench_throughput.py
+"""ワーカー数・シャード数ごとのスループット計測
+
+一時データベースに社員を登録し、gunicorn をワーカー数を変えて起動しながら
+「ログイン → 体調登録」の流れを繰り返して requests/sec を計測する。
+--shards を指定すると、社員を N 部署に振り分け、体調記録を部署ごとのシャードに保存した場合も計測する
+（0 はシャードなし）。
+
+    python bench_throughput.py --workers 1,2,4 --clients 4 --duration 10
+    python bench_throughput.py --workers 4 --shards 0,2,4
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.error import URLError
+from urllib.request import build_opener
+
+from loadtest import PASSWORD, Client
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def seed(database_url, users, departments=1):
+    """ベンチマーク用の社員を登録する（departments 部署に均等に振り分ける）"""
+    from werkzeug.security import generate_password_hash
+    from app import create_app
+    from extensions import db
+    from models import User, Department
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database_url}, web=False)
+    with app.app_context():
+        db.create_all()
+        for d in range(departments):
+            db.session.add(Department(name=f'ベンチマーク部{d}', abbreviation=f'bench{d}'))
+        password_hash = generate_password_hash(PASSWORD)
+        for i in range(users):
+            db.session.add(User(
+                employee_number=f'B{i:05}', department=f'bench{i % departments}', name=f'ベンチ {i}',
+                phone=f'000-{i:05}', email=f'bench{i}@example.com', password_hash=password_hash,
+            ))
+        db.session.commit()
+    return [f'B{i:05}' for i in range(users)]
+
+
+def run_flows(base_url, employee_numbers, deadline):
+    """期限までログイン → 体調登録を繰り返す（1スレッド分）"""
+    flows = errors = requests = 0
+    i = 0
+    while time.time() < deadline:
+        client = Client(base_url)
+        employee_number = employee_numbers[i % len(employee_numbers)]
+        i += 1
+        try:
+            login_status, _, _ = client.login(employee_number)
+            submit_status, _, submit_url = client.submit_health()
+        except URLError:
+            errors += 1
+            continue
+        finally:
+            requests += client.requests
+        # セッションが無効だとログイン画面に戻されるため、遷移先も確認する
+        if login_status == 200 and submit_status == 200 and submit_url.endswith('/display_health_result'):
+            flows += 1
+        else:
+            errors += 1
+    return flows, requests, errors
+
+
+def run_client_process(base_url, employee_numbers, threads, deadline):
+    with ThreadPoolExecutor(threads) as executor:
+        results = [executor.submit(run_flows, base_url, employee_numbers[t::threads], deadline) for t in range(threads)]
+        return [sum(values) for values in zip(*(r.result() for r in results))]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_ready(base_url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            build_opener().open(base_url + '/', timeout=1).close()
+            return
+        except (URLError, ConnectionError):
+            time.sleep(0.2)
+    raise RuntimeError('サーバーが起動しませんでした。')
+
+
+def bench(workers, args, env, employee_numbers):
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+         '--workers', str(workers), '--threads', str(args.threads),
+         '--bind', f'127.0.0.1:{port}', 'wsgi:app'],
+        cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready(base_url)
+        deadline = time.time() + args.duration
+        with ProcessPoolExecutor(args.clients) as executor:
+            results = [
+                executor.submit(run_client_process, base_url, employee_numbers[c::args.clients], args.client_threads, deadline)
+                for c in range(args.clients)
+            ]
+            flows, requests, errors = [sum(values) for values in zip(*(r.result() for r in results))]
+    finally:
+        server.terminate()
+        server.wait()
+    return flows / args.duration, requests / args.duration, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ワーカー数・シャード数ごとのスループット計測')
+    parser.add_argument('--workers', default=f'1,{os.cpu_count()}', help='計測するワーカー数（カンマ区切り）')
+    parser.add_argument('--shards', default='0', help='計測するシャード数（カンマ区切り。0 はシャードなし）')
+    parser.add_argument('--threads', type=int, default=4, help='ワーカーあたりのスレッド数')
+    parser.add_argument('--clients', type=int, default=4, help='負荷をかけるクライアントプロセス数')
+    parser.add_argument('--client-threads', type=int, default=4, help='クライアントプロセスあたりのスレッド数')
+    parser.add_argument('--duration', type=int, default=10, help='各計測の秒数')
+    parser.add_argument('--users', type=int, default=100, help='登録する社員数')
+    args = parser.parse_args()
+
+    print(f'{"シャード":>8}{"ワーカー":>8}{"flows/s":>12}{"req/s":>12}{"エラー":>8}{"倍率":>8}')
+    baseline = None
+    for shards in sorted({int(s) for s in args.shards.split(',')}):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            database_url = f'sqlite:///{os.path.join(temp_dir, "bench.db")}'
+            env = dict(os.environ, DATABASE_URL=database_url, SECRET_KEY='bench-secret-key')
+            env.pop('HEALTH_SHARD_DIR', None)
+            if shards:
+                env['HEALTH_SHARD_DIR'] = os.path.join(temp_dir, 'shards')
+            employee_numbers = seed(database_url, args.users, max(shards, 1))
+
+            for workers in sorted({int(w) for w in args.workers.split(',')}):
+                flows_per_sec, requests_per_sec, errors = bench(workers, args, env, employee_numbers)
+                baseline = baseline or requests_per_sec
+                print(f'{shards:>8}{workers:>8}{flows_per_sec:>12.1f}{requests_per_sec:>12.1f}{errors:>8}'
+                      f'{requests_per_sec / baseline:>7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
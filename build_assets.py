@@ -0,0 +1,187 @@
+# build_assets.py
+"""静的ファイルのビルド
+
+static/ 以下の CSS / JS を最小化し、内容ハッシュ付きのファイル名で
+static/dist に出力する。あわせて gzip / brotli の事前圧縮ファイルと
+manifest.json を生成する。外部ライブラリ（static/vendor）がない・内容が固定した
+SHA-256 と一致しない場合はビルドせずに終了する。
+
+    python build_assets.py                 # ビルド
+    python build_assets.py --fetch-vendor  # 外部ライブラリを取得し直す（要インターネット。バージョンを上げるとき）
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import sys
+import tarfile
+import urllib.request
+import zipfile
+
+from assets import STATIC_DIR, DIST_DIR, MANIFEST_PATH, VENDOR_ASSETS
+
+try:
+    import brotli
+except ImportError:  # brotli は任意。なければ gzip のみ生成する
+    brotli = None
+
+# 事前圧縮する拡張子（PNG などの圧縮済み形式は対象外）
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.ico', '.json', '.txt')
+
+HASH_LENGTH = 10
+
+
+# CSS の文字列（"..." / '...'）とコメント
+CSS_STRING_OR_COMMENT = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/', re.S)
+
+def minify_css_code(text):
+    """文字列・コメント以外の部分の余分な空白を取り除く"""
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    text = re.sub(r':\s+', ':', text)  # 「a :hover」の意味が変わらないよう、コロンの前の空白は残す
+    return text.replace(';}', '}')
+
+
+def minify_css(text):
+    """コメントと余分な空白を取り除く（文字列・content: の値の中はそのまま残す）"""
+    parts = []
+    position = 0
+    for match in CSS_STRING_OR_COMMENT.finditer(text):
+        parts.append(minify_css_code(text[position:match.start()]))
+        if match.group(1):
+            parts.append(match.group(1))  # 文字列
+        position = match.end()
+    parts.append(minify_css_code(text[position:]))
+    return ''.join(parts).replace(';}', '}').strip()
+
+
+def minify_js(text):
+    """行頭・行末の空白と空行のみを取り除く（改行は残すので ASI に影響しない）"""
+    lines = (line.strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+def minify(relative_path, data):
+    if relative_path.endswith('.css'):
+        return minify_css(data.decode('utf-8')).encode('utf-8')
+    if relative_path.endswith('.js') and not relative_path.endswith('.min.js'):
+        return minify_js(data.decode('utf-8')).encode('utf-8')
+    return data
+
+
+def hashed_name(relative_path, data):
+    """style.css → style.<hash>.css"""
+    root, ext = os.path.splitext(relative_path)
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+    return f'{root}.{digest}{ext}'
+
+
+def write_precompressed(path, data):
+    """元のサイズより小さくなる場合のみ .gz / .br を書き出す"""
+    written = []
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(compressed) < len(data):
+        with open(path + '.gz', 'wb') as f:
+            f.write(compressed)
+        written.append('gz')
+    if brotli is not None:
+        compressed = brotli.compress(data, quality=11)
+        if len(compressed) < len(data):
+            with open(path + '.br', 'wb') as f:
+                f.write(compressed)
+            written.append('br')
+    return written
+
+
+def iter_static_files():
+    for root, dirs, files in os.walk(STATIC_DIR):
+        if os.path.abspath(root) == os.path.abspath(STATIC_DIR) and 'dist' in dirs:
+            dirs.remove('dist')
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            yield os.path.relpath(path, STATIC_DIR).replace(os.sep, '/'), path
+
+
+def build():
+    shutil.rmtree(DIST_DIR, ignore_errors=True)
+    os.makedirs(DIST_DIR)
+
+    manifest = {}
+    for relative_path, path in iter_static_files():
+        with open(path, 'rb') as f:
+            data = minify(relative_path, f.read())
+
+        output_name = hashed_name(relative_path, data)
+        output_path = os.path.join(DIST_DIR, output_name)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, 'wb') as f:
+            f.write(data)
+
+        variants = []
+        if relative_path.endswith(COMPRESSIBLE_EXTENSIONS):
+            variants = write_precompressed(output_path, data)
+
+        manifest[relative_path] = output_name
+        print(f'{relative_path} → {output_name} ({len(data)} bytes, {", ".join(variants) or "非圧縮"})')
+
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    print(f'{len(manifest)} 件のアセットをビルドしました。')
+
+
+def check_vendor():
+    """外部ライブラリの有無と SHA-256 を確認し、問題の一覧を返す"""
+    problems = []
+    for relative_path, source in VENDOR_ASSETS.items():
+        path = os.path.join(STATIC_DIR, relative_path)
+        if not os.path.isfile(path):
+            problems.append(f'static/{relative_path} がありません。')
+            continue
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        if digest != source['sha256']:
+            problems.append(f'static/{relative_path} の SHA-256 が一致しません（{digest}）。')
+    return problems
+
+
+def read_archive_member(data, member):
+    """取得したアーカイブ（wheel / zip / npm の tgz）から1ファイルを取り出す"""
+    if zipfile.is_zipfile(io.BytesIO(data)):
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            return archive.read(member)
+    with tarfile.open(fileobj=io.BytesIO(data)) as archive:
+        return archive.extractfile(member).read()
+
+
+def fetch_vendor():
+    """外部ライブラリを取得する。バージョンを上げる場合は、VENDOR_ASSETS の url（member）と sha256 を更新してから実行する"""
+    for relative_path, source in VENDOR_ASSETS.items():
+        with urllib.request.urlopen(source['url']) as response:
+            data = response.read()
+        if source.get('member'):
+            data = read_archive_member(data, source['member'])
+        digest = hashlib.sha256(data).hexdigest()
+        if digest != source['sha256']:
+            sys.exit(f'{source["url"]} の SHA-256 が VENDOR_ASSETS と一致しません（{digest}）。')
+        path = os.path.join(STATIC_DIR, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        print(f'{source["url"]} → static/{relative_path}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='静的ファイルのビルド')
+    parser.add_argument('--fetch-vendor', action='store_true', help='外部ライブラリを static/vendor に取り込む')
+    args = parser.parse_args()
+
+    if args.fetch_vendor:
+        fetch_vendor()
+    problems = check_vendor()
+    if problems:
+        sys.exit('\n'.join(problems + ['外部ライブラリを確認してからビルドしてください（CDN にはフォールバックしません）。']))
+    build()
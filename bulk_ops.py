@@ -0,0 +1,194 @@
+# bulk_ops.py
+import re
+from datetime import datetime
+import click
+from flask.cli import with_appcontext
+from zoneinfo import ZoneInfo
+from sqlalchemy import delete, insert, literal, select, update
+
+from changefeed import log_changes
+from daily_records import delete_revisions
+from extensions import db, event_hub, health_shards
+from jobs import job
+from models import User, HealthRecord, HealthRecordArchive
+
+MODES = ('deactivate', 'delete')  # 社員の扱い: 無効化 / 削除
+RECORD_ACTIONS = ('archive', 'delete', 'keep')  # 体調記録の扱い: アーカイブ / 削除 / 残す
+
+USER_CHUNK_SIZE = 100  # 1トランザクションで処理する社員数
+DEFAULT_CHUNK_SIZE = 500  # 1トランザクションで処理する体調記録の件数
+
+# アーカイブにコピーする列（health_record と health_record_archive で共通。id は original_id に保存する）
+ARCHIVE_COLUMNS = ['user_id', 'day', 'temperature', 'throat', 'fever', 'cough', 'selected_parts', 'date', 'flag']
+
+
+def parse_employee_numbers(text):
+    """改行・カンマ・空白区切りの社員番号をリストにする"""
+    return [number for number in re.split(r'[\s,、]+', text or '') if number]
+
+
+def find_employee_ids(employee_numbers=None, department=None):
+    """社員番号のリストまたは部署（略称）から対象社員のIDを取得"""
+    if not employee_numbers and not department:
+        return []
+    query = db.session.query(User.id)
+    if employee_numbers:
+        query = query.filter(User.employee_number.in_(employee_numbers))
+    if department:
+        query = query.filter(User.department == department)
+    return [user_id for user_id, in query.order_by(User.id)]
+
+
+def group_by_department(user_ids):
+    """社員IDを部署（体調記録の保存先）ごとにまとめる"""
+    groups = {}
+    for start in range(0, len(user_ids), USER_CHUNK_SIZE):
+        rows = db.session.query(User.id, User.department).filter(User.id.in_(user_ids[start:start + USER_CHUNK_SIZE]))
+        for user_id, department in rows.order_by(User.id):
+            groups.setdefault(department, []).append(user_id)
+    return groups
+
+
+def retire_employees(user_ids, mode='deactivate', records='archive', chunk_size=DEFAULT_CHUNK_SIZE, progress=None,
+                     chunk_done=None):
+    """社員をまとめて無効化・削除し、体調記録をアーカイブまたは削除する
+
+    書き込みロックを長時間保持しないよう、体調記録は chunk_size 件ずつ、
+    社員は USER_CHUNK_SIZE 人ずつ別々のトランザクションでコミットする。
+    体調記録は部署ごとのシャード内でアーカイブする。
+    progress(社員の処理数, 社員数, 記録の処理数, 記録数) で進捗を通知し、
+    chunk_done(社員IDのリスト) で処理が完了（コミット）した社員を通知する。
+    """
+    if mode not in MODES:
+        raise ValueError(f'不明な処理です: {mode}')
+    if records not in RECORD_ACTIONS:
+        raise ValueError(f'不明な体調記録の扱いです: {records}')
+    if mode == 'delete' and records == 'keep':
+        raise ValueError('社員を削除する場合は、体調記録をアーカイブまたは削除してください。')
+
+    groups = group_by_department(user_ids)
+    chunks = [
+        (department, ids[start:start + USER_CHUNK_SIZE])
+        for department, ids in groups.items()
+        for start in range(0, len(ids), USER_CHUNK_SIZE)
+    ]
+    total_records = 0
+    if records != 'keep':
+        total_records = sum(
+            health_shards.session_for(department).query(HealthRecord.id).filter(HealthRecord.user_id.in_(chunk)).count()
+            for department, chunk in chunks
+        )
+    result = {'employees': 0, 'records': 0}
+
+    def report():
+        if progress:
+            progress(result['employees'], len(user_ids), result['records'], total_records)
+
+    for department, chunk in chunks:
+        health_session = health_shards.session_for(department)
+
+        while records != 'keep':
+            record_rows = health_session.execute(
+                select(HealthRecord.id, HealthRecord.user_id).where(HealthRecord.user_id.in_(chunk)).limit(chunk_size)
+            ).all()
+            if not record_rows:
+                break
+            record_ids = [record_id for record_id, _ in record_rows]
+            if records == 'archive':
+                archived_at = datetime.now(ZoneInfo('Asia/Tokyo'))
+                health_session.execute(insert(HealthRecordArchive).from_select(
+                    ['original_id'] + ARCHIVE_COLUMNS + ['archived_at'],
+                    select(HealthRecord.id, *(getattr(HealthRecord, column) for column in ARCHIVE_COLUMNS),
+                           literal(archived_at))
+                    .where(HealthRecord.id.in_(record_ids))
+                ))
+            health_session.execute(
+                delete(HealthRecord).where(HealthRecord.id.in_(record_ids)),
+                execution_options={'synchronize_session': False}
+            )
+            log_changes(health_session, 'health_record', record_rows, 'delete')
+            health_session.commit()  # チャンクごとにコミットしてロックを解放する
+            result['records'] += len(record_ids)
+            report()
+        if records == 'delete':
+            delete_revisions(health_session, chunk)  # 修正履歴も残さない
+            health_session.commit()
+
+        if mode == 'delete':
+            statement = delete(User).where(User.id.in_(chunk))
+        else:
+            statement = update(User).where(User.id.in_(chunk)).values(is_active=False)
+        db.session.execute(statement, execution_options={'synchronize_session': False})
+        log_changes(db.session, 'user', [(user_id, user_id) for user_id in chunk], 'delete' if mode == 'delete' else 'upsert')
+        db.session.commit()
+        result['employees'] += len(chunk)
+        if chunk_done:
+            chunk_done(chunk)
+        report()
+
+        # 社員情報一覧を開いている管理者の画面から行を消す
+        for user_id in chunk:
+            event_hub.publish({'type': 'removed', 'user_id': user_id})
+
+    db.session.expire_all()
+    return result
+
+
+@job('retire_employees')
+def retire_employees_job(ctx):
+    """retire_employees をバックグラウンドで実行する
+
+    チェックポイントには処理が完了した社員のIDを保存し、再開時はそれ以外の社員だけを対象にする
+    （ジョブの開始前から無効だった社員も対象に残る）。
+    """
+    done = ctx.checkpoint or {'employees': 0, 'records': 0}
+    finished = list(done.get('finished', []))
+    finished_ids = set(finished)
+    user_ids = [user_id for user_id in ctx.params['user_ids'] if user_id not in finished_ids]
+
+    def chunk_done(chunk):
+        finished.extend(chunk)
+
+    def progress(employees_done, employees_total, records_done, records_total):
+        checkpoint = {
+            'employees': done['employees'] + employees_done,
+            'records': done['records'] + records_done,
+            'finished': finished,
+        }
+        ctx.save(
+            checkpoint=checkpoint,
+            progress=checkpoint['employees'] + checkpoint['records'],
+            total=done['employees'] + done['records'] + employees_total + records_total,
+        )
+
+    result = retire_employees(user_ids, ctx.params['mode'], ctx.params['records'], progress=progress,
+                              chunk_done=chunk_done)
+    return {'employees': done['employees'] + result['employees'], 'records': done['records'] + result['records']}
+
+
+@click.command('retire-employees')
+@click.option('--employee-number', 'employee_numbers', multiple=True, help='対象の社員番号（複数指定可）')
+@click.option('--department', help='対象の部署（略称）')
+@click.option('--mode', type=click.Choice(MODES), default='deactivate', show_default=True, help='社員を無効化するか削除するか')
+@click.option('--records', type=click.Choice(RECORD_ACTIONS), default='archive', show_default=True, help='体調記録の扱い')
+@click.option('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, show_default=True, help='1トランザクションで処理する体調記録の件数')
+@click.option('--yes', is_flag=True, help='確認せずに実行する')
+@with_appcontext
+def retire_employees_command(employee_numbers, department, mode, records, chunk_size, yes):
+    """社員をまとめて無効化・削除する"""
+    user_ids = find_employee_ids(list(employee_numbers), department)
+    if not user_ids:
+        raise click.ClickException('対象の社員が見つかりませんでした。')
+
+    click.echo(f'対象: {len(user_ids)} 人（社員: {mode} / 体調記録: {records}）')
+    if not yes:
+        click.confirm('実行しますか？', abort=True)
+
+    def progress(employees_done, employees_total, records_done, records_total):
+        click.echo(f'\r社員 {employees_done}/{employees_total}  体調記録 {records_done}/{records_total}', nl=False)
+
+    try:
+        result = retire_employees(user_ids, mode, records, chunk_size, progress)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'\n完了しました: 社員 {result["employees"]} 人、体調記録 {result["records"]} 件')
@@ -0,0 +1,201 @@
+# changefeed.py
+import base64
+import heapq
+import hmac
+import json
+from datetime import datetime
+from flask import current_app, request
+from flask_login import current_user
+from zoneinfo import ZoneInfo
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from extensions import db, health_shards
+from models import User, HealthRecord, ChangeLog, jst_datetime
+from responses import columnar
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 1000
+CATALOG_SOURCE = 'catalog'  # 社員の変更（シャーディングしない場合は体調記録も）を記録するデータベース
+
+# 変更を記録するモデルと change_log.entity の対応
+TRACKED_MODELS = {User: 'user', HealthRecord: 'health_record'}
+
+# 列形式で返す場合の変更の列と、data の entity ごとの列（health_record_data / user_data のキー）
+CHANGE_COLUMNS = ['entity', 'id', 'shard', 'user_id', 'action', 'changed_at', 'data']
+DATA_COLUMNS = {
+    'health_record': ['day', 'temperature', 'throat', 'fever', 'cough', 'selected_parts', 'date', 'flag'],
+    'user': ['employee_number', 'name', 'department', 'phone', 'email', 'is_admin', 'is_active'],
+}
+
+
+# --- 変更の記録 ---
+
+def change_entry(entity, entity_id, user_id, action):
+    return {
+        'entity': entity,
+        'entity_id': entity_id,
+        'user_id': user_id,
+        'action': action,
+        'changed_at': datetime.now(ZoneInfo('Asia/Tokyo')),
+    }
+
+
+def record_changes(session, flush_context):
+    """社員・体調記録の追加・変更・削除を、同じトランザクションで change_log に記録する
+
+    SQLite は書き込みを1つずつ確定するため、change_log.id の昇順はコミット順と一致する。
+    """
+    entries = []
+    for objects, action in ((session.new, 'upsert'), (session.dirty, 'upsert'), (session.deleted, 'delete')):
+        for obj in objects:
+            entity = TRACKED_MODELS.get(type(obj))
+            if entity is None or (objects is session.dirty and not session.is_modified(obj)):
+                continue
+            user_id = obj.id if entity == 'user' else obj.user_id
+            entries.append(change_entry(entity, obj.id, user_id, action))
+    if entries:
+        session.connection().execute(insert(ChangeLog.__table__), entries)
+
+
+def log_changes(session, entity, rows, action):
+    """ORM を通さない一括更新・削除の変更を記録する（rows: [(entity_id, user_id), ...]）"""
+    entries = [change_entry(entity, entity_id, user_id, action) for entity_id, user_id in rows]
+    if entries:
+        session.execute(insert(ChangeLog.__table__), entries)
+
+
+def init_change_log():
+    """すべてのセッション（シャードのセッションを含む）で変更を記録する"""
+    if not event.contains(Session, 'after_flush', record_changes):
+        event.listen(Session, 'after_flush', record_changes)
+
+
+# --- 変更フィード ---
+
+def encode_cursor(positions):
+    """{取得元: 最後に返した change_log.id} を不透明なカーソル文字列にする"""
+    data = json.dumps(positions, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """カーソル文字列を {取得元: change_log.id} に戻す（不正な場合は ValueError）"""
+    if not cursor:
+        return {}
+    try:
+        positions = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError('invalid cursor')
+    if not isinstance(positions, dict) or not all(
+        isinstance(key, str) and isinstance(value, int) and not isinstance(value, bool)
+        for key, value in positions.items()
+    ):
+        raise ValueError('invalid cursor')
+    return positions
+
+
+def health_record_data(record):
+    return {
+        'day': record.day.isoformat() if record.day else None,
+        'temperature': record.temperature,
+        'throat': record.throat,
+        'fever': record.fever,
+        'cough': record.cough,
+        'selected_parts': record.selected_parts or '',
+        'date': jst_datetime(record.date).strftime('%Y-%m-%d %H:%M:%S') if record.date else None,  # day と同じ基準
+        'flag': record.flag,
+    }
+
+
+def user_data(user):
+    return {
+        'employee_number': user.employee_number,
+        'name': user.name,
+        'department': user.department,
+        'phone': user.phone,
+        'email': user.email,
+        'is_admin': bool(user.is_admin),
+        'is_active': bool(user.is_active),
+    }
+
+
+def fetch_changes(session, source, after, limit):
+    """1つのデータベースから after より後の変更を最大 limit 件、現在のデータとともに取得する"""
+    logs = session.query(ChangeLog).filter(ChangeLog.id > after).order_by(ChangeLog.id).limit(limit).all()
+
+    data = {}
+    record_ids = [log.entity_id for log in logs if log.entity == 'health_record']
+    if record_ids:
+        for record in session.query(HealthRecord).filter(HealthRecord.id.in_(record_ids)):
+            data['health_record', record.id] = health_record_data(record)
+    user_ids = [log.entity_id for log in logs if log.entity == 'user']
+    if user_ids:
+        for user in session.query(User).filter(User.id.in_(user_ids)):
+            data['user', user.id] = user_data(user)
+
+    shard = source.split(':', 1)[1] if source != CATALOG_SOURCE else None
+    return [{
+        'source': source,
+        'seq': log.id,
+        'entity': log.entity,
+        'id': log.entity_id,
+        'shard': shard,  # シャーディング時、体調記録の id はシャードごとの番号
+        'user_id': log.user_id,
+        'action': log.action,
+        'changed_at': log.changed_at,
+        'data': data.get((log.entity, log.entity_id)) if log.action != 'delete' else None,  # 削除済みの場合は None
+    } for log in logs]
+
+
+def read_changes(cursor, limit=DEFAULT_PAGE_SIZE):
+    """カーソル以降の変更を最大 limit 件返す
+
+    取得元（共通データベースと各シャード）ごとに change_log.id の位置をカーソルに持ち、
+    それぞれから limit + 1 件まで読んで変更日時順に併合する。
+    """
+    positions = decode_cursor(cursor)
+    batches = [fetch_changes(db.session, CATALOG_SOURCE, positions.get(CATALOG_SOURCE, 0), limit + 1)]
+    if health_shards.enabled:
+        batches += health_shards.map_shards(
+            lambda name, session: fetch_changes(session, f'shard:{name}', positions.get(f'shard:{name}', 0), limit + 1)
+        ).values()
+
+    # 各取得元の順序を保ったまま併合するため、先頭から limit 件取れば取得元ごとに連続した範囲になる
+    merged = list(heapq.merge(*batches, key=lambda change: change['changed_at']))
+    changes = merged[:limit]
+    for change in changes:
+        positions[change.pop('source')] = change.pop('seq')
+    for change in changes:
+        change['changed_at'] = change['changed_at'].strftime('%Y-%m-%d %H:%M:%S.%f')
+
+    return {
+        'changes': changes,
+        'cursor': encode_cursor(positions),
+        'has_more': len(merged) > limit,
+    }
+
+
+def columnar_changes(page):
+    """read_changes の結果を列形式にする（data も entity ごとの列順の配列にする）"""
+    rows = []
+    for change in page['changes']:
+        data = change['data']
+        if data is not None:
+            data = [data[column] for column in DATA_COLUMNS[change['entity']]]
+        rows.append([change[column] for column in CHANGE_COLUMNS[:-1]] + [data])
+    body = columnar(CHANGE_COLUMNS, rows)
+    body.update(data_columns=DATA_COLUMNS, cursor=page['cursor'], has_more=page['has_more'])
+    return body
+
+
+def is_authorized():
+    """管理者のログインセッション、または CHANGE_FEED_TOKENS のいずれかの Bearer トークンで認証する"""
+    if current_user.is_authenticated and current_user.is_admin:
+        return True
+    header = request.headers.get('Authorization', '')
+    if not header.startswith('Bearer '):
+        return False
+    token = header[len('Bearer '):].strip()
+    tokens = [t.strip() for t in (current_app.config.get('CHANGE_FEED_TOKENS') or '').split(',') if t.strip()]
+    return any(hmac.compare_digest(token.encode('utf-8'), t.encode('utf-8')) for t in tokens)
@@ -1,7 +1,44 @@
 # config.py
 import os
+import secrets
+
 
 class Config:
-    SECRET_KEY = os.urandom(24)  # 秘密鍵
-    SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'data.sqlite')}"  # データベースURI
-    SQLALCHEMY_TRACK_MODIFICATIONS = False  # 変更追跡を無効化
\ No newline at end of file
+    # 秘密鍵（未設定の場合は instance/secret_key を全ワーカーで共有する）
+    SECRET_KEY = os.environ.get('SECRET_KEY')
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///your_database.db')  # データベースURI
+    SQLALCHEMY_TRACK_MODIFICATIONS = False  # 変更追跡を無効化
+    SQLITE_BUSY_TIMEOUT_MS = 5000  # 書き込みロック待ちの最大時間
+    EVENT_FANOUT_DIR = os.environ.get('EVENT_FANOUT_DIR')  # 複数ワーカー間でイベントを転送するディレクトリ
+    HEALTH_SHARD_DIR = os.environ.get('HEALTH_SHARD_DIR')  # 体調記録を部署ごとのデータベースに分割して保存するディレクトリ（未設定なら分割しない）
+    HEALTH_SHARD_MAP = os.environ.get('HEALTH_SHARD_MAP')  # 部署をまとめて1つのシャードにする場合の対応（例: "hr:tokyo,it:tokyo"）
+    CHANGE_FEED_TOKENS = os.environ.get('CHANGE_FEED_TOKENS')  # 変更フィードAPIの Bearer トークン（カンマ区切りで複数可）
+    REMINDER_CUTOFFS = os.environ.get('REMINDER_CUTOFFS', '09:00,12:00')  # 未登録者を集計する締め時刻（日本時間、カンマ区切り）
+
+
+def load_secret_key(path):
+    """秘密鍵をファイルから読み込む。なければ作成する
+
+    複数のワーカーが同時に起動しても同じ鍵を使うよう、一時ファイルに書き込んでから
+    os.link で配置する（既に存在する場合は作成済みの鍵を使う）。
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(secrets.token_hex(32))
+    try:
+        os.link(temp_path, path)
+    except FileExistsError:
+        pass  # 他のワーカーが先に作成した
+    finally:
+        os.remove(temp_path)
+
+    with open(path, encoding='utf-8') as f:
+        return f.read().strip()
@@ -0,0 +1,94 @@
+# daily_records.py
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import and_, delete, insert, select
+
+from changefeed import log_changes
+from extensions import health_shards
+from models import HealthRecord, HealthRecordRevision, jst_day
+
+# 修正履歴にコピーする列（health_record と health_record_revision で共通）
+REVISION_COLUMNS = ['user_id', 'day', 'temperature', 'throat', 'fever', 'cough', 'selected_parts', 'date', 'flag']
+DEDUPE_CHUNK_SIZE = 1000
+
+
+def upsert_statement(session):
+    """データベースに合わせた INSERT ... ON CONFLICT 文を作る"""
+    if session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(HealthRecord)
+
+
+def upsert_daily_record(session, user_id, day, values):
+    """(社員, 日) の体調記録を登録する。同じ日の記録があれば修正履歴に移してから上書きする
+
+    修正履歴へのコピーと上書きは同じトランザクションで行い、呼び出し側でコミットする。
+    登録（または上書き）した記録の ID を返す。
+    """
+    same_day = and_(HealthRecord.user_id == user_id, HealthRecord.day == day)
+    session.execute(insert(HealthRecordRevision).from_select(
+        REVISION_COLUMNS, select(*(getattr(HealthRecord, column) for column in REVISION_COLUMNS)).where(same_day)
+    ))
+    statement = upsert_statement(session).values(user_id=user_id, day=day, **values)
+    statement = statement.on_conflict_do_update(index_elements=['user_id', 'day'], set_=values)
+    record_id = session.execute(statement.returning(HealthRecord.id)).scalar_one()
+    log_changes(session, 'health_record', [(record_id, user_id)], 'upsert')
+    return record_id
+
+
+def move_to_revision(session, record):
+    """記録を修正履歴に移す"""
+    session.add(HealthRecordRevision(**{column: getattr(record, column) for column in REVISION_COLUMNS}))
+    session.delete(record)
+    session.flush()  # 一意制約に掛からないよう、後の記録に day を設定する前に削除を確定する
+
+
+def dedupe_source(session, chunk_size=DEDUPE_CHUNK_SIZE):
+    """day が未設定の記録に日付を設定し、同じ日の記録は最新の1件だけを残して修正履歴に移す
+
+    ID の昇順に chunk_size 件ずつ処理してコミットするため、中断しても再実行すれば続きから処理する。
+    登録日時のない記録は対象外。(設定した件数, 修正履歴に移した件数) を返す。
+    """
+    assigned = revised = 0
+    last_id = 0
+    while True:
+        records = session.query(HealthRecord).filter(
+            HealthRecord.id > last_id, HealthRecord.day.is_(None), HealthRecord.date.isnot(None)
+        ).order_by(HealthRecord.id).limit(chunk_size).all()
+        if not records:
+            break
+        last_id = records[-1].id
+        for record in records:
+            day = jst_day(record.date)
+            current = session.query(HealthRecord).filter(
+                HealthRecord.user_id == record.user_id, HealthRecord.day == day
+            ).one_or_none()
+            if current is not None and (current.date, current.id) > (record.date, record.id):
+                move_to_revision(session, record)  # 同じ日のより新しい記録がある
+                revised += 1
+                continue
+            if current is not None:
+                move_to_revision(session, current)
+                revised += 1
+            record.day = day
+            session.flush()
+            assigned += 1
+        session.commit()
+    return assigned, revised
+
+
+@click.command('dedupe-health-records')
+@click.option('--chunk-size', type=int, default=DEDUPE_CHUNK_SIZE, show_default=True, help='1トランザクションで処理する体調記録の件数')
+@with_appcontext
+def dedupe_health_records_command(chunk_size):
+    """既存の体調記録に登録日を設定し、同じ日の重複を修正履歴に移す（1日1件にする移行用）"""
+    for name, session in health_shards.sources():
+        assigned, revised = dedupe_source(session, chunk_size)
+        click.echo(f'{name or "health_record"}: 登録日を設定 {assigned} 件、修正履歴に移動 {revised} 件')
+
+
+def delete_revisions(session, user_ids):
+    """社員の修正履歴を削除する"""
+    session.execute(delete(HealthRecordRevision).where(HealthRecordRevision.user_id.in_(user_ids)))
@@ -0,0 +1,126 @@
+# events.py
+import glob
+import json
+import os
+import queue
+import socket
+import threading
+
+
+class EventHub:
+    """プロセス内のイベント配信ハブ（Server-Sent Events 用）
+
+    publish したイベントを subscribe 中のすべてのキューに配る。
+    EVENT_FANOUT_DIR を設定すると、同じディレクトリを使う他のワーカープロセスにも
+    Unix ドメインソケット経由でイベントを転送する。
+    """
+
+    def __init__(self, app=None):
+        self.fanout_dir = None
+        self.queue_size = 100
+        self.keepalive_seconds = 15
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._socket = None
+        self._socket_pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('EVENT_FANOUT_DIR', None)
+        app.config.setdefault('EVENT_QUEUE_SIZE', 100)
+        app.config.setdefault('EVENT_KEEPALIVE_SECONDS', 15)
+        self.fanout_dir = app.config['EVENT_FANOUT_DIR']
+        self.queue_size = app.config['EVENT_QUEUE_SIZE']
+        self.keepalive_seconds = app.config['EVENT_KEEPALIVE_SECONDS']
+        if self.fanout_dir:
+            os.makedirs(self.fanout_dir, exist_ok=True)
+        app.extensions['event_hub'] = self
+
+    def subscribe(self):
+        self._ensure_listener()
+        q = queue.Queue(self.queue_size)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def publish(self, event):
+        """自プロセスの購読者に配信し、ファンアウトが有効なら他のワーカーにも送る"""
+        self._deliver(event)
+        if self.fanout_dir:
+            self._send_to_peers(json.dumps(event, ensure_ascii=False).encode('utf-8'))
+
+    def stream(self, q):
+        """購読キューから text/event-stream 形式の文字列を生成する"""
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    event = q.get(timeout=self.keepalive_seconds)
+                except queue.Empty:
+                    # 切断を検知するため定期的にコメント行を送る
+                    yield ': keepalive\n\n'
+                    continue
+                yield f'event: {event["type"]}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n'
+        finally:
+            self.unsubscribe(q)
+
+    def _deliver(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                pass  # 受信が追いつかない購読者のイベントは捨てる
+
+    # --- ワーカー間のファンアウト ---
+
+    def _socket_path(self, pid):
+        return os.path.join(self.fanout_dir, f'{pid}.sock')
+
+    def _ensure_listener(self):
+        """このワーカー用の受信ソケットを作成する（フォーク後に1回だけ）"""
+        if not self.fanout_dir or self._socket_pid == os.getpid():
+            return
+        with self._lock:
+            if self._socket_pid == os.getpid():
+                return
+            path = self._socket_path(os.getpid())
+            if os.path.exists(path):
+                os.remove(path)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.bind(path)
+            self._socket = sock
+            self._socket_pid = os.getpid()
+        threading.Thread(target=self._listen, args=(sock,), daemon=True).start()
+
+    def _listen(self, sock):
+        while True:
+            data = sock.recv(65536)
+            try:
+                self._deliver(json.loads(data.decode('utf-8')))
+            except ValueError:
+                continue
+
+    def _send_to_peers(self, payload):
+        own_path = self._socket_path(os.getpid())
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.setblocking(False)
+            for path in glob.glob(os.path.join(self.fanout_dir, '*.sock')):
+                if path == own_path:
+                    continue
+                try:
+                    sock.sendto(payload, path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # 終了したワーカーのソケットを片付ける
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                except BlockingIOError:
+                    pass  # 受信側のバッファが一杯の場合は諦める
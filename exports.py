@@ -0,0 +1,91 @@
+# exports.py
+import csv
+import os
+from datetime import datetime, timedelta
+
+from extensions import db, health_shards
+from jobs import job
+from models import User, HealthRecord, jst_datetime
+
+EXPORT_CHUNK_SIZE = 2000  # 1回に読み込んで書き出す体調記録の件数
+
+EXPORT_COLUMNS = [
+    '社員番号', '氏名', '部署', '日時', '体温', '喉の痛み', '発熱', '咳', '痛む部位', '不調フラグ',
+]
+
+
+def export_filter(start, end):
+    """期間（YYYY-MM-DD、終了日を含む）の絞り込み条件"""
+    conditions = []
+    if start:
+        conditions.append(HealthRecord.date >= datetime.strptime(start, '%Y-%m-%d'))
+    if end:
+        conditions.append(HealthRecord.date < datetime.strptime(end, '%Y-%m-%d') + timedelta(days=1))
+    return conditions
+
+
+@job('export_health_records')
+def export_health_records(ctx):
+    """体調記録を CSV に書き出す
+
+    保存先（シャード）ごとに ID の昇順で EXPORT_CHUNK_SIZE 件ずつ読み込み、
+    書き出すたびにファイルの位置をチェックポイントに保存する。
+    再開時は最後のチェックポイントの位置までファイルを切り詰めてから続きを書き出す。
+    """
+    conditions = export_filter(ctx.params.get('start'), ctx.params.get('end'))
+    sources = health_shards.sources()
+    path = ctx.result_path('health_records.csv')
+    users = {
+        user_id: (employee_number, name, department)
+        for user_id, employee_number, name, department
+        in db.session.query(User.id, User.employee_number, User.name, User.department)
+    }
+
+    checkpoint = ctx.checkpoint or {'source': sources[0][0] if sources else None, 'last_id': 0, 'offset': 0, 'rows': 0}
+    if ctx.checkpoint is None:
+        total = sum(session.query(HealthRecord.id).filter(*conditions).count() for _, session in sources)
+        with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+            csv.writer(f).writerow(EXPORT_COLUMNS)
+            checkpoint['offset'] = f.tell()
+        ctx.save(checkpoint=checkpoint, progress=0, total=total)
+    else:
+        with open(path, 'r+b') as f:
+            f.truncate(checkpoint['offset'])  # 保存前に書きかけた行を捨てる
+
+    with open(path, 'a', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        # 保存先はシャード名の順に処理する（チェックポイントにはシャード名を保存する）
+        start = next((i for i, (source, _) in enumerate(sources) if source == checkpoint['source']), 0)
+        for source, session in sources[start:]:
+            last_id = checkpoint['last_id'] if source == checkpoint['source'] else 0
+            while True:
+                # 大量の記録を ORM オブジェクトにしないよう、必要な列だけを取得する
+                records = session.query(
+                    HealthRecord.id, HealthRecord.user_id, HealthRecord.date, HealthRecord.temperature,
+                    HealthRecord.throat, HealthRecord.fever, HealthRecord.cough, HealthRecord.selected_parts,
+                    HealthRecord.flag
+                ).filter(
+                    HealthRecord.id > last_id, *conditions
+                ).order_by(HealthRecord.id).limit(EXPORT_CHUNK_SIZE).all()
+                if not records:
+                    break
+                for record in records:
+                    employee_number, name, department = users.get(record.user_id, ('', '', ''))
+                    parts = record.selected_parts
+                    writer.writerow([
+                        employee_number, name, department,
+                        jst_datetime(record.date).strftime('%Y-%m-%d %H:%M:%S') if record.date else '',
+                        record.temperature, record.throat, record.fever, record.cough,
+                        ', '.join(parts) if isinstance(parts, list) else (parts or ''),
+                        record.flag,
+                    ])
+                last_id = records[-1].id
+                f.flush()
+                os.fsync(f.fileno())
+                checkpoint = {
+                    'source': source, 'last_id': last_id, 'offset': f.tell(),
+                    'rows': checkpoint['rows'] + len(records),
+                }
+                ctx.save(checkpoint=checkpoint, progress=checkpoint['rows'])
+
+    return {'file': os.path.basename(path), 'rows': checkpoint['rows']}
@@ -0,0 +1,21 @@
+# extensions.py
+from flask_sqlalchemy import SQLAlchemy
+from lazy_migrate import LazyMigrate
+from flask_login import LoginManager
+from assets import Assets
+from template_cache import TemplateCache
+from events import EventHub
+from responses import Compression
+from sharding import HealthShards
+from jobs import JobRunner
+
+# アプリケーションに依存しない拡張機能のインスタンス（create_app で初期化する）
+db = SQLAlchemy()
+migrate = LazyMigrate()  # alembic は flask db の実行時まで読み込まない
+login_manager = LoginManager()
+assets = Assets()
+template_cache = TemplateCache()
+event_hub = EventHub()
+compression = Compression()
+health_shards = HealthShards()
+jobs = JobRunner()
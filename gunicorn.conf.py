@@ -0,0 +1,47 @@
+# gunicorn.conf.py
+"""gunicorn の設定（prefork + スレッド）
+
+環境変数で上書きできる:
+    BIND              待ち受けアドレス（既定: 0.0.0.0:8080）
+    WEB_CONCURRENCY   ワーカープロセス数（既定: CPUコア数 × 2 + 1）
+    GUNICORN_THREADS  ワーカーあたりのスレッド数（既定: 4）
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:8080')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+timeout = 30
+keepalive = 5
+
+# マスターでアプリを1回だけ作成してからフォークする（秘密鍵の作成やテンプレートの読み込みを共有）
+preload_app = True
+
+# メモリリーク対策として一定数のリクエストごとにワーカーを入れ替える
+max_requests = 1000
+max_requests_jitter = 100
+
+# 管理者向けのライブ更新（SSE）をワーカー間で転送する
+os.environ.setdefault('EVENT_FANOUT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'events'))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')  # 例: "-" で標準出力
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    # マスターで作成された DB 接続をフォーク先で使い回さない
+    from extensions import db, health_shards
+    app = server.app.wsgi()
+    with app.app_context():
+        db.engine.dispose(close=False)
+    health_shards.dispose()
+
+    # 停止したジョブを起動時に再開する（全ワーカーが再投入しても、claim により実行されるのは1回だけ）
+    from extensions import jobs
+    with app.app_context():
+        try:
+            jobs.recover()
+        except Exception:
+            server.log.exception('停止したジョブの再開に失敗しました')
@@ -0,0 +1,246 @@
+# jobs.py
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from zoneinfo import ZoneInfo
+from sqlalchemy import or_, update
+
+STATUSES = ('queued', 'running', 'done', 'failed')
+
+# ワーカープロセスの create_app に引き継ぐ設定
+WORKER_CONFIG_KEYS = (
+    'SECRET_KEY', 'SQLALCHEMY_DATABASE_URI', 'SQLITE_BUSY_TIMEOUT_MS', 'EVENT_FANOUT_DIR',
+    'HEALTH_SHARD_DIR', 'HEALTH_SHARD_MAP', 'JOB_RESULT_DIR', 'JOB_STALE_SECONDS', 'JOB_MAX_ATTEMPTS',
+)
+
+# ジョブの種類と処理関数の対応（@job で登録する）
+JOB_FUNCTIONS = {}
+
+_worker_app = None  # ワーカープロセスで作成したアプリケーション
+
+
+def job(kind):
+    """ジョブの処理関数を登録するデコレーター。関数は JobContext を受け取り、結果（JSON）を返す"""
+    def decorator(fn):
+        JOB_FUNCTIONS[kind] = fn
+        return fn
+    return decorator
+
+
+def now():
+    return datetime.now(ZoneInfo('Asia/Tokyo'))
+
+
+class JobContext:
+    """ジョブの処理関数に渡す実行中の情報
+
+    checkpoint は前回最後に保存したチャンクの位置（初回は None）。
+    チャンクをコミットするたびに save() で位置と進捗を保存すると、
+    ワーカーが停止した場合もその位置から再開される。
+    """
+
+    def __init__(self, job):
+        self.job_id = job.id
+        self.params = job.params or {}
+        self.checkpoint = job.checkpoint
+        self.resumed = job.checkpoint is not None
+
+    def save(self, checkpoint=None, progress=None, total=None):
+        """チャンクの位置と進捗を保存する"""
+        from extensions import db
+        from models import Job
+
+        values = {'heartbeat_at': now()}
+        if checkpoint is not None:
+            values['checkpoint'] = checkpoint
+            self.checkpoint = checkpoint
+        if progress is not None:
+            values['progress'] = progress
+        if total is not None:
+            values['total'] = total
+        db.session.execute(update(Job).where(Job.id == self.job_id).values(**values))
+        db.session.commit()
+
+    def result_path(self, filename):
+        """結果ファイルの保存先（JOB_RESULT_DIR/<ジョブID>_<ファイル名>）"""
+        result_dir = current_app.config['JOB_RESULT_DIR']
+        os.makedirs(result_dir, exist_ok=True)
+        return os.path.join(result_dir, f'{self.job_id}_{filename}')
+
+
+class JobRunner:
+    """重い管理者向け処理をプロセスプールで実行するバックグラウンドジョブ
+
+    ジョブは job テーブルに保存し、queued → running → done / failed と遷移する。
+    実行中のジョブは定期的に heartbeat_at を更新し、更新が JOB_STALE_SECONDS 以上途絶えた
+    ジョブ（ワーカーの再起動などで停止したもの）は、最後に保存したチェックポイントから再開する。
+    """
+
+    def __init__(self, app=None):
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self._last_recovered = None  # 初回は必ず実行する
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('JOB_WORKERS', 2)
+        app.config.setdefault('JOB_RESULT_DIR', os.path.join(app.instance_path, 'job_results'))
+        app.config.setdefault('JOB_STALE_SECONDS', 120)
+        app.config.setdefault('JOB_MAX_ATTEMPTS', 3)
+        app.config.setdefault('JOB_EAGER', False)  # True の場合はプロセスを使わずその場で実行する
+        app.extensions['jobs'] = self
+
+    def enqueue(self, kind, params=None, user_id=None):
+        """ジョブを登録して実行を開始する"""
+        from extensions import db
+        from models import Job
+
+        if kind not in JOB_FUNCTIONS:
+            raise ValueError(f'不明なジョブです: {kind}')
+        new_job = Job(kind=kind, params=params or {}, status='queued', created_by=user_id)
+        db.session.add(new_job)
+        db.session.commit()
+        self.submit(new_job.id)
+        return new_job
+
+    def submit(self, job_id):
+        if current_app.config['JOB_EAGER']:
+            execute(job_id)
+            return
+        config = {key: current_app.config.get(key) for key in WORKER_CONFIG_KEYS}
+        self._get_executor(config).submit(run_job, job_id)
+
+    def recover(self):
+        """停止したジョブ（待機中のまま、または heartbeat が途絶えたもの）を再投入する"""
+        from extensions import db
+        from models import Job
+
+        stale_seconds = current_app.config['JOB_STALE_SECONDS']
+        if self._last_recovered is not None and time.monotonic() - self._last_recovered < stale_seconds / 2:
+            return
+        self._last_recovered = time.monotonic()
+
+        stale_before = now() - timedelta(seconds=stale_seconds)
+        job_ids = db.session.query(Job.id).filter(or_(
+            (Job.status == 'queued') & (Job.created_at < stale_before),
+            (Job.status == 'running') & (Job.heartbeat_at < stale_before),
+        )).order_by(Job.id).all()
+        for job_id, in job_ids:
+            self.submit(job_id)
+
+    def _get_executor(self, config):
+        # gunicorn のワーカーごとに作成する（フォーク前に作成したプールは使わない）
+        import multiprocessing  # 最初のジョブを登録するまで読み込まない
+        from concurrent.futures import ProcessPoolExecutor
+
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    current_app.config['JOB_WORKERS'],
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=init_worker,
+                    initargs=(config,),
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+
+def init_worker(config):
+    """ワーカープロセスの初期化（親プロセスと同じ設定でアプリケーションを作成）"""
+    global _worker_app
+    from app import create_app
+    _worker_app = create_app(config, web=False)  # ワーカーはリクエストを処理しない
+
+
+def run_job(job_id):
+    with _worker_app.app_context():
+        execute(job_id)
+
+
+def claim(job_id):
+    """ジョブの実行権を取得する（他のワーカーが実行中の場合は False）"""
+    from extensions import db
+    from models import Job
+
+    stale_before = now() - timedelta(seconds=current_app.config['JOB_STALE_SECONDS'])
+    result = db.session.execute(
+        update(Job)
+        .where(Job.id == job_id)
+        .where(or_(Job.status == 'queued', (Job.status == 'running') & (Job.heartbeat_at < stale_before)))
+        .values(status='running', worker_pid=os.getpid(), heartbeat_at=now(), started_at=now(),
+                attempts=Job.attempts + 1)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def heartbeat(app, job_id, stop):
+    """実行中であることを示すため、処理とは別のスレッドで heartbeat_at を更新し続ける"""
+    from extensions import db
+    from models import Job
+
+    interval = app.config['JOB_STALE_SECONDS'] / 4
+    with app.app_context():
+        while not stop.wait(interval):
+            db.session.execute(update(Job).where(Job.id == job_id).values(heartbeat_at=now()))
+            db.session.commit()
+
+
+def execute(job_id):
+    """ジョブを実行し、結果またはエラーを保存する"""
+    from extensions import db
+    from models import Job
+
+    if not claim(job_id):
+        return
+    current_job = db.session.get(Job, job_id)
+    if current_job.attempts > current_app.config['JOB_MAX_ATTEMPTS']:
+        current_job.status = 'failed'
+        current_job.error = '再試行の上限に達しました。'
+        current_job.finished_at = now()
+        db.session.commit()
+        return
+
+    stop = threading.Event()
+    threading.Thread(
+        target=heartbeat, args=(current_app._get_current_object(), job_id, stop), daemon=True
+    ).start()
+    try:
+        result = JOB_FUNCTIONS[current_job.kind](JobContext(current_job))
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception(f'ジョブ {job_id} が失敗しました')
+        values = {'status': 'failed', 'error': str(e) or type(e).__name__, 'finished_at': now()}
+    else:
+        values = {'status': 'done', 'result': result, 'finished_at': now()}
+    finally:
+        stop.set()
+    db.session.execute(update(Job).where(Job.id == job_id).values(**values))
+    db.session.commit()
+
+
+def job_to_dict(current_job):
+    """ジョブの状態を API 用の辞書にする"""
+    percent = None
+    if current_job.total:
+        percent = min(100, round(current_job.progress * 100 / current_job.total))
+    elif current_job.status == 'done':
+        percent = 100
+    return {
+        'id': current_job.id,
+        'kind': current_job.kind,
+        'status': current_job.status,
+        'progress': current_job.progress,
+        'total': current_job.total,
+        'percent': percent,
+        'result': current_job.result,
+        'error': current_job.error,
+        'attempts': current_job.attempts,
+        'created_at': current_job.created_at.strftime('%Y-%m-%d %H:%M:%S') if current_job.created_at else None,
+        'finished_at': current_job.finished_at.strftime('%Y-%m-%d %H:%M:%S') if current_job.finished_at else None,
+    }
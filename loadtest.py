@@ -0,0 +1,275 @@
+# loadtest.py
+"""始業時の集中アクセスを再現する負荷試験ツール
+
+起動中のサーバーに対して、仮想社員が一斉に「ログイン → 体調登録」を行い、
+同時に仮想管理者が社員情報一覧を繰り返し再読み込みする。
+ステップごとのスループット・レイテンシ（p50/p95/p99）と、
+"database is locked" / 5xx の件数を集計する。
+
+    # サーバーと同じ DATABASE_URL で負荷試験用の社員を登録
+    python loadtest.py --seed 500
+
+    # 500人が60秒かけてログイン・登録する間、管理者5人が5秒ごとに一覧を再読み込み
+    python loadtest.py --base-url http://127.0.0.1:8080 --employees 500 --admins 5 --ramp-up 60
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPException
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, build_opener
+
+PASSWORD = 'password123'
+EMPLOYEE_PREFIX = 'LT'
+ADMIN_PREFIX = 'LTA'
+CSRF_PATTERN = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+LOCKED_MARKER = 'database is locked'
+
+
+class Client:
+    """クッキーを保持する簡易 HTTP クライアント"""
+
+    def __init__(self, base_url, stats=None):
+        self.base_url = base_url
+        self.opener = build_opener(HTTPCookieProcessor(CookieJar()))
+        self.stats = stats
+        self.requests = 0
+
+    def request(self, path, data=None, step=None):
+        """リクエストを送り (ステータス, 本文, 最終URL) を返す（リダイレクトは追従する）"""
+        body = urlencode(data).encode() if data is not None else None
+        started = time.perf_counter()
+        try:
+            with self.opener.open(self.base_url + path, body, timeout=60) as response:
+                # リダイレクト先も1リクエストとして数える
+                self.requests += 2 if response.url != self.base_url + path else 1
+                result = response.status, response.read().decode('utf-8', 'replace'), response.url
+        except HTTPError as e:
+            self.requests += 1
+            result = e.code, e.read().decode('utf-8', 'replace'), e.url
+        if self.stats is not None and step is not None:
+            self.stats.record(step, time.perf_counter() - started, result[0], result[1])
+        return result
+
+    def login(self, employee_number):
+        status, html, url = self.request('/', step='login_page')
+        match = CSRF_PATTERN.search(html)
+        return self.request('/', {
+            'csrf_token': match.group(1) if match else '',
+            'employee_number': employee_number,
+            'password': PASSWORD,
+        }, step='login')
+
+    def submit_health(self, temperature=36.5, unwell=False):
+        return self.request('/health_result', {
+            'temperature': f'{temperature:.1f}',
+            'throat': 'sore' if unwell else 'normal',
+            'fever': 'normal',
+            'cough': 'no',
+            'selectedParts': '',
+        }, step='health_submit')
+
+
+class Stats:
+    """ステップごとのレイテンシとエラー件数を集計する（スレッドセーフ）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.locked = Counter()
+        self.connection_errors = Counter()
+        self.flows = 0
+
+    def record(self, step, seconds, status, body):
+        with self._lock:
+            self.latencies[step].append(seconds)
+            self.statuses[step][status] += 1
+            if status >= 500 and LOCKED_MARKER in body:
+                self.locked[step] += 1
+
+    def record_connection_error(self, step):
+        with self._lock:
+            self.connection_errors[step] += 1
+
+    def record_flow(self):
+        with self._lock:
+            self.flows += 1
+
+    def summary(self, elapsed):
+        steps = {}
+        for step, values in self.latencies.items():
+            values = sorted(values)
+            steps[step] = {
+                'count': len(values),
+                'throughput': len(values) / elapsed,
+                'p50_ms': percentile(values, 50) * 1000,
+                'p95_ms': percentile(values, 95) * 1000,
+                'p99_ms': percentile(values, 99) * 1000,
+                'max_ms': values[-1] * 1000,
+                'status_5xx': sum(n for status, n in self.statuses[step].items() if status >= 500),
+                'database_locked': self.locked[step],
+                'connection_errors': self.connection_errors[step],
+            }
+        total_requests = sum(s['count'] for s in steps.values())
+        return {
+            'elapsed_s': elapsed,
+            'requests': total_requests,
+            'requests_per_s': total_requests / elapsed,
+            'completed_flows': self.flows,
+            'flows_per_s': self.flows / elapsed,
+            'status_5xx': sum(s['status_5xx'] for s in steps.values()),
+            'database_locked': sum(s['database_locked'] for s in steps.values()),
+            'connection_errors': sum(s['connection_errors'] for s in steps.values()),
+            'steps': steps,
+        }
+
+
+def percentile(sorted_values, p):
+    """最近接順位法によるパーセンタイル"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def seed(employees, admins):
+    """負荷試験用の社員・管理者を登録する（登録済みの社員番号は飛ばす）
+
+    サーバーと同じデータベースに書き込むため、環境変数 DATABASE_URL を揃えて実行すること。
+    """
+    from werkzeug.security import generate_password_hash
+    from app import create_app
+    from extensions import db
+    from models import User, Department
+
+    app = create_app(web=False)
+    with app.app_context():
+        db.create_all()
+        departments = [d.abbreviation for d in Department.query.all()]
+        if not departments:
+            db.session.add(Department(name='負荷試験部', abbreviation='loadtest'))
+            departments = ['loadtest']
+
+        existing = {number for number, in db.session.query(User.employee_number).filter(
+            User.employee_number.like(f'{EMPLOYEE_PREFIX}%')
+        )}
+        password_hash = generate_password_hash(PASSWORD)  # 全員同じパスワードなのでハッシュは1回だけ計算
+        accounts = [(f'{EMPLOYEE_PREFIX}{i:05}', False) for i in range(1, employees + 1)]
+        accounts += [(f'{ADMIN_PREFIX}{i:03}', True) for i in range(1, admins + 1)]
+        created = 0
+        for number, is_admin in accounts:
+            if number in existing:
+                continue
+            db.session.add(User(
+                employee_number=number, department=random.choice(departments), name=f'負荷試験 {number}',
+                phone=number, email=f'{number.lower()}@loadtest.example.com',
+                password_hash=password_hash, is_admin=is_admin,
+            ))
+            created += 1
+        db.session.commit()
+    print(f'{created} 件の負荷試験用アカウントを登録しました。')
+
+
+def run_employee(base_url, stats, employee_number, start_at, unwell_rate):
+    """仮想社員: 開始時刻まで待ってからログイン → 体調登録画面 → 登録"""
+    time.sleep(max(0.0, start_at - time.time()))
+    client = Client(base_url, stats)
+    step = 'login'
+    try:
+        client.login(employee_number)
+        step = 'health_page'
+        client.request('/health', step=step)
+        step = 'health_submit'
+        unwell = random.random() < unwell_rate
+        temperature = random.uniform(37.3, 38.5) if unwell else random.uniform(36.0, 36.9)
+        submit_status, _, submit_url = client.submit_health(temperature, unwell)
+    except (OSError, HTTPException):  # 接続の拒否・切断やタイムアウト（URLError を含む）
+        stats.record_connection_error(step)
+        return
+    if submit_status == 200 and submit_url.endswith('/display_health_result'):
+        stats.record_flow()
+
+
+def run_admin(base_url, stats, employee_number, interval, stop):
+    """仮想管理者: 終了まで社員情報一覧を一定間隔で再読み込みする"""
+    client = Client(base_url, stats)
+    try:
+        client.login(employee_number)
+        while not stop.is_set():
+            client.request('/view_employee', step='view_employee')
+            stop.wait(random.uniform(0.5, 1.5) * interval)
+    except (OSError, HTTPException):  # 接続の拒否・切断やタイムアウト（URLError を含む）
+        stats.record_connection_error('view_employee')
+
+
+def print_report(summary):
+    print(f'経過時間: {summary["elapsed_s"]:.1f}s  リクエスト: {summary["requests"]} '
+          f'({summary["requests_per_s"]:.1f} req/s)  完了した登録: {summary["completed_flows"]} '
+          f'({summary["flows_per_s"]:.1f} /s)')
+    print(f'5xx: {summary["status_5xx"]}  database is locked: {summary["database_locked"]}  '
+          f'接続エラー: {summary["connection_errors"]}')
+    print(f'{"ステップ":<16}{"件数":>7}{"件/s":>8}{"p50":>9}{"p95":>9}{"p99":>9}{"max":>9}{"5xx":>6}{"locked":>8}')
+    for step, s in summary['steps'].items():
+        print(f'{step:<16}{s["count"]:>7}{s["throughput"]:>8.1f}{s["p50_ms"]:>7.0f}ms{s["p95_ms"]:>7.0f}ms'
+              f'{s["p99_ms"]:>7.0f}ms{s["max_ms"]:>7.0f}ms{s["status_5xx"]:>6}{s["database_locked"]:>8}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='始業時の集中アクセスを再現する負荷試験')
+    parser.add_argument('--base-url', default='http://127.0.0.1:8080')
+    parser.add_argument('--seed', type=int, metavar='N', help='負荷試験用の社員を N 人登録して終了する')
+    parser.add_argument('--employees', type=int, default=100, help='仮想社員の数')
+    parser.add_argument('--admins', type=int, default=2, help='仮想管理者の数')
+    parser.add_argument('--ramp-up', type=float, default=30, help='全社員がアクセスを開始するまでの秒数')
+    parser.add_argument('--admin-interval', type=float, default=5, help='管理者の再読み込み間隔（秒）')
+    parser.add_argument('--unwell-rate', type=float, default=0.05, help='体調不良として登録する割合')
+    parser.add_argument('--concurrency', type=int, default=200, help='同時に動かす仮想社員の上限（スレッド数）')
+    parser.add_argument('--json', metavar='PATH', help='集計結果を JSON で保存する')
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        seed(args.seed, args.admins)
+        return
+
+    stats = Stats()
+    stop = threading.Event()
+    started = time.time()
+
+    admin_threads = [
+        threading.Thread(target=run_admin, args=(args.base_url, stats, f'{ADMIN_PREFIX}{i:03}', args.admin_interval, stop), daemon=True)
+        for i in range(1, args.admins + 1)
+    ]
+    for thread in admin_threads:
+        thread.start()
+
+    # 始業時刻付近にアクセスが集中するよう、開始時刻を三角分布でばらつかせる
+    schedule = sorted(
+        (started + random.triangular(0, args.ramp_up, args.ramp_up / 3), f'{EMPLOYEE_PREFIX}{i:05}')
+        for i in range(1, args.employees + 1)
+    )
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        for start_at, employee_number in schedule:
+            executor.submit(run_employee, args.base_url, stats, employee_number, start_at, args.unwell_rate)
+
+    stop.set()
+    for thread in admin_threads:
+        thread.join()
+
+    summary = stats.summary(time.time() - started)
+    print_report(summary)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,24 @@
 # models.py
-from app import db
+from extensions import db
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
-from pytz import timezone
+from zoneinfo import ZoneInfo
+
+# 登録日時を日本時間にする（タイムゾーンのない日時は日本時間として扱う）
+def jst_datetime(value):
+    if value.tzinfo is None:
+        return value.replace(tzinfo=ZoneInfo('Asia/Tokyo'))
+    return value.astimezone(ZoneInfo('Asia/Tokyo'))
+
+# 登録日時から日本時間の日付を求める
+def jst_day(value):
+    return jst_datetime(value).date()
+
+def default_day(context):
+    """day の既定値（同じ INSERT の date から求める）"""
+    value = context.get_current_parameters().get('date')
+    return jst_day(value or datetime.now(ZoneInfo('Asia/Tokyo')))
 
 # ユーザーテーブル
 class User(UserMixin, db.Model):
@@ -16,6 +31,7 @@ class User(UserMixin, db.Model):
     name = db.Column(db.String(100), nullable=False)
     phone = db.Column(db.String(15), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
+    is_active = db.Column(db.Boolean, nullable=False, default=True, server_default=db.true())  # 退職・無効化された社員は False
 
     def __repr__(self):
         return f'<User {self.name}>'
@@ -26,9 +42,10 @@ class User(UserMixin, db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
-# 体調テーブル
+# 体調テーブル（社員ごとに1日1件。同じ日に再登録した場合は上書きし、以前の内容は修正履歴に残す）
 class HealthRecord(db.Model):
     __tablename__ = 'health_record'
+    __table_args__ = (db.UniqueConstraint('user_id', 'day', name='uq_health_record_user_day'),)
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     temperature = db.Column(db.Float, nullable=False)
@@ -36,11 +53,108 @@ class HealthRecord(db.Model):
     fever = db.Column(db.String(100))
     cough = db.Column(db.String(100))
     selected_parts = db.Column(db.JSON)
-    date = db.Column(db.DateTime, default=lambda: datetime.now(timezone('Asia/Tokyo')))  # 日本の標準時間でのデフォルト値
+    date = db.Column(db.DateTime, default=lambda: datetime.now(ZoneInfo('Asia/Tokyo')))  # 日本の標準時間でのデフォルト値
+    day = db.Column(db.Date, default=default_day, index=True)  # 登録日（日本時間）。既存の記録は flask dedupe-health-records で設定する
     flag = db.Column(db.Integer, default=0) # 不調フラグ
     def __repr__(self):
         return f'<HealthRecord {self.id} by User {self.user_id}>'
 
+# 体調テーブルのアーカイブ（削除・無効化した社員の記録の保管先）
+class HealthRecordArchive(db.Model):
+    __tablename__ = 'health_record_archive'
+    id = db.Column(db.Integer, primary_key=True)  # シャード間で移すと採番し直すため、元の記録の識別には original_id を使う
+    original_id = db.Column(db.Integer)  # 元の health_record.id（アーカイブした時点のデータベースでの番号）
+    user_id = db.Column(db.Integer, nullable=False, index=True)  # 社員を削除しても残すため外部キーにしない
+    temperature = db.Column(db.Float, nullable=False)
+    throat = db.Column(db.String(100))
+    fever = db.Column(db.String(100))
+    cough = db.Column(db.String(100))
+    selected_parts = db.Column(db.JSON)
+    date = db.Column(db.DateTime)
+    day = db.Column(db.Date)
+    flag = db.Column(db.Integer, default=0)
+    archived_at = db.Column(db.DateTime, default=lambda: datetime.now(ZoneInfo('Asia/Tokyo')))
+    def __repr__(self):
+        return f'<HealthRecordArchive {self.id} by User {self.user_id}>'
+
+# 体調記録の修正履歴テーブル（同じ日に再登録される前の内容）
+class HealthRecordRevision(db.Model):
+    __tablename__ = 'health_record_revision'
+    __table_args__ = (db.Index('ix_health_record_revision_user_day', 'user_id', 'day'),)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    temperature = db.Column(db.Float, nullable=False)
+    throat = db.Column(db.String(100))
+    fever = db.Column(db.String(100))
+    cough = db.Column(db.String(100))
+    selected_parts = db.Column(db.JSON)
+    date = db.Column(db.DateTime)  # 修正前の登録日時
+    flag = db.Column(db.Integer, default=0)
+    revised_at = db.Column(db.DateTime, default=lambda: datetime.now(ZoneInfo('Asia/Tokyo')))
+    def __repr__(self):
+        return f'<HealthRecordRevision {self.id} by User {self.user_id} on {self.day}>'
+
+# 変更履歴テーブル（変更フィード用。id の昇順が変更の確定順）
+class ChangeLog(db.Model):
+    __tablename__ = 'change_log'
+    __table_args__ = {'sqlite_autoincrement': True}  # 古い履歴を消しても番号を再利用しない
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)  # 'health_record' / 'user'
+    entity_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)  # 対象の社員
+    action = db.Column(db.String(10), nullable=False)  # 'upsert' / 'delete'
+    changed_at = db.Column(db.DateTime, default=lambda: datetime.now(ZoneInfo('Asia/Tokyo')))
+    def __repr__(self):
+        return f'<ChangeLog {self.id} {self.action} {self.entity} {self.entity_id}>'
+
+# バックグラウンドジョブテーブル
+class Job(db.Model):
+    __tablename__ = 'job'
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # ジョブの種類（jobs.JOB_FUNCTIONS のキー）
+    params = db.Column(db.JSON)
+    status = db.Column(db.String(10), nullable=False, default='queued', index=True)  # queued / running / done / failed
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer)
+    checkpoint = db.Column(db.JSON)  # 最後にコミットしたチャンクの位置（再開用）
+    result = db.Column(db.JSON)  # 結果の概要（出力ファイル名など）
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    worker_pid = db.Column(db.Integer)
+    created_by = db.Column(db.Integer)  # 登録した管理者の社員ID
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(ZoneInfo('Asia/Tokyo')))
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind} {self.status}>'
+
+# 未登録者スナップショットテーブル（締め時刻ごとに1件）
+class ReminderSnapshot(db.Model):
+    __tablename__ = 'reminder_snapshot'
+    __table_args__ = (db.UniqueConstraint('day', 'cutoff', name='uq_reminder_snapshot_day_cutoff'),)
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)  # 対象日（日本時間）
+    cutoff = db.Column(db.String(5), nullable=False)  # 締め時刻（HH:MM）
+    taken_at = db.Column(db.DateTime, default=lambda: datetime.now(ZoneInfo('Asia/Tokyo')))  # 集計した日時
+    active_count = db.Column(db.Integer, nullable=False, default=0)  # 集計時の有効な社員数
+    def __repr__(self):
+        return f'<ReminderSnapshot {self.day} {self.cutoff}>'
+
+# 未登録者スナップショットの社員（集計時点の社員情報をコピーして保存する）
+class ReminderEntry(db.Model):
+    __tablename__ = 'reminder_entry'
+    __table_args__ = (db.Index('ix_reminder_entry_snapshot_department', 'snapshot_id', 'department'),)
+    id = db.Column(db.Integer, primary_key=True)
+    snapshot_id = db.Column(db.Integer, db.ForeignKey('reminder_snapshot.id'), nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    employee_number = db.Column(db.String(100))
+    name = db.Column(db.String(100))
+    department = db.Column(db.String(100))
+    def __repr__(self):
+        return f'<ReminderEntry {self.snapshot_id} {self.employee_number}>'
+
 # 部署名テーブル
 class Department(db.Model):
     __tablename__ = 'departments'
@@ -57,4 +171,4 @@ class Announcement(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     content = db.Column(db.Text, nullable=False)
-    date = db.Column(db.DateTime, default=lambda: datetime.now(timezone('Asia/Tokyo')))  # 日本の標準時間でのデフォルト値
\ No newline at end of file
+    date = db.Column(db.DateTime, default=lambda: datetime.now(ZoneInfo('Asia/Tokyo')))  # 日本の標準時間でのデフォルト値
\ No newline at end of file
@@ -0,0 +1,171 @@
+# reminders.py
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import and_, delete, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db, health_shards
+from models import User, HealthRecord, ReminderSnapshot, ReminderEntry
+
+SNAPSHOT_KEEP_DAYS = 31  # スナップショットを残す日数
+
+
+def parse_cutoffs(value):
+    """'09:00,12:00' 形式の締め時刻を time のリスト（昇順）にする"""
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        value = ','.join(value)
+    cutoffs = set()
+    for item in value.split(','):
+        item = item.strip()
+        if item:
+            cutoffs.add(datetime.strptime(item, '%H:%M').time())
+    return sorted(cutoffs)
+
+
+def now_jst():
+    return datetime.now(ZoneInfo('Asia/Tokyo'))
+
+
+def due_cutoff(now=None):
+    """現在までに過ぎた最後の締め時刻（HH:MM）。最初の締め時刻より前は None"""
+    now = now or now_jst()
+    passed = [cutoff for cutoff in parse_cutoffs(current_app.config['REMINDER_CUTOFFS']) if cutoff <= now.time()]
+    return passed[-1].strftime('%H:%M') if passed else None
+
+
+def unregistered_employees(day):
+    """指定日に体調を登録していない有効な社員 [(id, 社員番号, 氏名, 部署)] と有効な社員数を返す
+
+    体調記録が同じデータベースにある場合は、社員と体調記録の (user_id, day) の一意キーの反結合1回で求める。
+    部署別に分割している場合は結合できないため、各シャードの登録済み社員を day の索引で並列に取得して除外する。
+    """
+    columns = (User.id, User.employee_number, User.name, User.department)
+    active_count = db.session.query(User.id).filter(User.is_active).count()
+    if not health_shards.enabled:
+        rows = db.session.execute(
+            select(*columns)
+            .outerjoin(HealthRecord, and_(HealthRecord.user_id == User.id, HealthRecord.day == day))
+            .where(User.is_active, HealthRecord.id.is_(None))
+            .order_by(User.department, User.employee_number)
+        ).all()
+        return rows, active_count
+
+    registered = set()
+    for user_ids in health_shards.fan_out(
+        lambda session: session.scalars(select(HealthRecord.user_id).where(HealthRecord.day == day)).all()
+    ):
+        registered.update(user_ids)
+    rows = db.session.execute(
+        select(*columns).where(User.is_active).order_by(User.department, User.employee_number)
+    ).all()
+    return [row for row in rows if row.id not in registered], active_count
+
+
+def take_snapshot(day, cutoff):
+    """指定日・締め時刻の未登録者を集計して保存する（既にあればそれを返す）
+
+    (day, cutoff) の一意制約により、複数のワーカーで同時に集計しても保存されるのは1件だけ。
+    """
+    snapshot = find_snapshot(day, cutoff)
+    if snapshot is not None:
+        return snapshot
+
+    rows, active_count = unregistered_employees(day)
+    snapshot = ReminderSnapshot(day=day, cutoff=cutoff, active_count=active_count)
+    db.session.add(snapshot)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()  # 他のワーカーが先に保存した
+        return find_snapshot(day, cutoff)
+    if rows:
+        db.session.execute(insert(ReminderEntry), [
+            {'snapshot_id': snapshot.id, 'user_id': user_id, 'employee_number': employee_number,
+             'name': name, 'department': department}
+            for user_id, employee_number, name, department in rows
+        ])
+    delete_old_snapshots(day - timedelta(days=SNAPSHOT_KEEP_DAYS))
+    db.session.commit()
+    return snapshot
+
+
+def delete_old_snapshots(before):
+    """before より前のスナップショットを削除する"""
+    old_ids = select(ReminderSnapshot.id).where(ReminderSnapshot.day < before)
+    db.session.execute(delete(ReminderEntry).where(ReminderEntry.snapshot_id.in_(old_ids)))
+    db.session.execute(delete(ReminderSnapshot).where(ReminderSnapshot.day < before))
+
+
+def find_snapshot(day, cutoff):
+    return ReminderSnapshot.query.filter_by(day=day, cutoff=cutoff).one_or_none()
+
+
+def current_snapshot(now=None):
+    """本日の集計済みのスナップショットのうち、現在までに過ぎた最後の締め時刻のもの（なければ None）
+
+    閲覧では集計しない（集計は flask snapshot-unregistered を締め時刻ごとに cron などで実行する）。
+    最後の締め時刻の集計がまだない場合は、それより前の締め時刻の集計を返す。
+    """
+    now = now or now_jst()
+    cutoff = due_cutoff(now)
+    if cutoff is None:
+        return None
+    return ReminderSnapshot.query.filter(
+        ReminderSnapshot.day == now.date(), ReminderSnapshot.cutoff <= cutoff
+    ).order_by(ReminderSnapshot.cutoff.desc()).first()
+
+
+def snapshot_digest(snapshot, department=None):
+    """スナップショットの未登録者を部署ごとにまとめる {部署: [{社員}, ...]}（department 指定時はその部署のみ）"""
+    query = ReminderEntry.query.filter(ReminderEntry.snapshot_id == snapshot.id)
+    if department:
+        query = query.filter(ReminderEntry.department == department)
+    digest = {}
+    for entry in query.order_by(ReminderEntry.department, ReminderEntry.employee_number):
+        digest.setdefault(entry.department, []).append({
+            'user_id': entry.user_id,
+            'employee_number': entry.employee_number,
+            'name': entry.name,
+        })
+    return digest
+
+
+def snapshot_to_dict(snapshot):
+    return {
+        'day': snapshot.day.strftime('%Y-%m-%d'),
+        'cutoff': snapshot.cutoff,
+        'taken_at': snapshot.taken_at.strftime('%Y-%m-%d %H:%M:%S') if snapshot.taken_at else None,
+        'active_count': snapshot.active_count,
+    }
+
+
+@click.command('snapshot-unregistered')
+@click.option('--cutoff', default=None, help='締め時刻（HH:MM。既定: 現在までに過ぎた最後の締め時刻）')
+@click.option('--day', default=None, help='対象日（YYYY-MM-DD。既定: 本日）')
+@with_appcontext
+def snapshot_unregistered_command(cutoff, day):
+    """未登録者のスナップショットを集計する（cron などで数分ごとに実行する）
+
+    --cutoff を省略した場合は、締め時刻を過ぎていなければ何もせず、集計済みであれば何も出力しない。
+    """
+    now = now_jst()
+    scheduled = cutoff is None
+    cutoff = cutoff or due_cutoff(now)
+    if cutoff is None:
+        return  # まだ締め時刻を過ぎていない
+    try:
+        cutoff = time.fromisoformat(cutoff).strftime('%H:%M')
+        target_day = datetime.strptime(day, '%Y-%m-%d').date() if day else now.date()
+    except ValueError:
+        raise click.ClickException('締め時刻は HH:MM、対象日は YYYY-MM-DD で指定してください。')
+    if scheduled and find_snapshot(target_day, cutoff) is not None:
+        return  # この締め時刻は集計済み
+    snapshot = take_snapshot(target_day, cutoff)
+    count = ReminderEntry.query.filter_by(snapshot_id=snapshot.id).count()
+    click.echo(f'{snapshot.day} {snapshot.cutoff}: 未登録 {count} 人 / {snapshot.active_count} 人')
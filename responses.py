@@ -0,0 +1,120 @@
+# responses.py
+import gzip
+from flask import jsonify, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson は任意。なければ標準の json を使う
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # brotli は任意。なければ gzip のみ
+    brotli = None
+
+# 列形式（配列の配列）の JSON を要求する Accept ヘッダー
+COLUMNAR_MIMETYPE = 'application/vnd.choppeeeer.columnar+json'
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """orjson があれば orjson でシリアライズする JSON プロバイダー
+
+    日付などの変換は Flask の既定と同じ結果になるよう DefaultJSONProvider に任せる。
+    ensure_ascii は使わず UTF-8 のまま出力するため、日本語のラベルも短くなる。
+    """
+
+    def _orjson_options(self):
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._orjson_options()).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        # bytes のまま Response に渡し、str への変換を省く
+        body = orjson.dumps(obj, default=self.default, option=self._orjson_options())
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def wants_columnar():
+    """?format=columnar または Accept ヘッダーで列形式が要求されているか"""
+    if request.args.get('format') == 'columnar':
+        return True
+    return request.accept_mimetypes[COLUMNAR_MIMETYPE] > 0 and \
+        request.accept_mimetypes[COLUMNAR_MIMETYPE] >= request.accept_mimetypes['application/json']
+
+
+def columnar(columns, rows, labels=None):
+    """列名と行（配列の配列）からなる列形式のレスポンス本体を作る"""
+    body = {'columns': columns, 'rows': rows}
+    if labels:
+        body['labels'] = labels
+    return body
+
+
+def columnar_response(body):
+    """列形式の本体を列形式の Content-Type で返す（Accept で形式が変わるため Vary: Accept を付ける）"""
+    response = jsonify(body)
+    response.mimetype = COLUMNAR_MIMETYPE
+    response.vary.add('Accept')
+    return response
+
+
+class Compression:
+    """一定サイズ以上の JSON / HTML レスポンスを brotli または gzip で圧縮する"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESS_MIMETYPES', ['application/json', COLUMNAR_MIMETYPE, 'text/html'])
+        app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+        app.config.setdefault('COMPRESS_BROTLI_QUALITY', 5)
+        self.config = app.config
+        app.after_request(self.compress)
+        app.extensions['compression'] = self
+
+    def choose_encoding(self):
+        accept_encodings = request.accept_encodings
+        if brotli is not None and accept_encodings['br'] > 0:
+            return 'br'
+        if accept_encodings['gzip'] > 0:
+            return 'gzip'
+        return None
+
+    def compress(self, response):
+        if (
+            response.direct_passthrough
+            or response.is_streamed  # SSE などのストリーミングは対象外
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in self.config['COMPRESS_MIMETYPES']
+            or not 200 <= response.status_code < 300
+        ):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self.choose_encoding()
+        data = response.get_data()
+        if encoding is None or len(data) < self.config['COMPRESS_MIN_SIZE']:
+            return response
+
+        if encoding == 'br':
+            compressed = brotli.compress(data, quality=self.config['COMPRESS_BROTLI_QUALITY'])
+        else:
+            compressed = gzip.compress(data, compresslevel=self.config['COMPRESS_GZIP_LEVEL'])
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        if response.headers.get('ETag'):
+            etag, _ = response.get_etag()
+            response.set_etag(etag, weak=True)
+        return response
@@ -1,16 +1,25 @@
 # routes.py
-import json, re, pytz
-from datetime import datetime, timedelta
-from flask import render_template, request, redirect, url_for, flash, jsonify, session
+import json, os, re
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from flask import Blueprint, Response, current_app, render_template, request, redirect, url_for, flash, jsonify, session, send_file
 from flask_login import login_user, logout_user, login_required, current_user
 from sqlalchemy import Date, func
 from sqlalchemy.orm import aliased
 from sqlalchemy.sql import or_, and_, func, literal
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.exc import IntegrityError, OperationalError
 
-from app import app, db, login_manager
-from models import User, HealthRecord ,Department, Announcement
-from forms import LoginForm, AddEmployeeForm, EmployeeForm
+from extensions import db, login_manager, event_hub, health_shards, jobs
+from models import User, HealthRecord ,Department, Announcement, Job, ReminderSnapshot, jst_datetime, jst_day
+from timeseries import MAX_POINTS, choose_resolution, downsample
+from responses import wants_columnar, columnar, columnar_response
+from jobs import job_to_dict
+from changefeed import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, columnar_changes, is_authorized, read_changes
+from daily_records import upsert_daily_record
+from reminders import current_snapshot, due_cutoff, find_snapshot, snapshot_digest, snapshot_to_dict
+from bulk_ops import MODES, RECORD_ACTIONS, find_employee_ids, parse_employee_numbers, retire_employees
+
+bp = Blueprint('main', __name__)
 
 
 
@@ -25,9 +34,52 @@ def check_admin_permission():
     """管理者権限を確認し、なければアクセスを拒否する"""
     if not current_user.is_admin:
         flash("このページにアクセスする権限がありません。", 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     return None  # 管理者の場合は何もしない
 
+# 体調記録のセッション取得関数の定義
+def get_health_session(user_id):
+    """社員の体調記録が保存されているデータベース（部署のシャード）のセッションを取得"""
+    department = db.session.query(User.department).filter(User.id == user_id).scalar()
+    return health_shards.session_for(department)
+
+# 症状の表示ラベル（列名: (正常時の値, (正常時のラベル, 異常時のラベル))）
+SYMPTOM_LABELS = {
+    'throat': ('normal', ('ない', '痛い')),
+    'fever': ('normal', ('ない', '高い')),
+    'cough': ('no', ('ない', 'ある')),
+}
+
+# グラフの表示期間を計算する関数の定義
+def get_period_range(period):
+    """表示期間（1w, 2w, 1m, 3m, 1y, 2y, 5y）から開始・終了日時（UTC）を計算"""
+    # 現在の日時を取得し、明後日の日付を計算
+    end_date = datetime.now(timezone.utc) + timedelta(days=1)  # 明後日
+    start_date = end_date - timedelta(days=7)  # 明後日から過去7日間
+
+    if period == '2w':
+        start_date = end_date - timedelta(weeks=2)
+    elif period == '1m':
+        start_date = end_date - timedelta(days=30)
+    elif period == '3m':
+        start_date = end_date - timedelta(weeks=12)
+    elif period == '1y':
+        start_date = end_date - timedelta(weeks=52)
+    elif period == '2y':
+        start_date = end_date - timedelta(weeks=104)
+    elif period == '5y':
+        start_date = end_date - timedelta(weeks=260)
+    return start_date, end_date
+
+# グラフの表示期間
+GRAPH_PERIODS = ('1w', '2w', '1m', '3m', '1y', '2y', '5y')
+
+def is_daily_period(period):
+    """表示期間の日数がグラフを日単位で表示する上限（MAX_POINTS）以内か"""
+    start_date, end_date = get_period_range(period)
+    jst = ZoneInfo('Asia/Tokyo')
+    return (end_date.astimezone(jst).date() - start_date.astimezone(jst).date()).days <= MAX_POINTS
+
 def get_last_registered_employee():
     # 最新の社員をIDで取得
     return User.query.order_by(User.id.desc()).first()
@@ -35,7 +87,8 @@ def get_last_registered_employee():
 # ユーザー情報の読み込み
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user = User.query.get(int(user_id))
+    return user if user and user.is_active else None  # 無効化された社員のセッションは無効
 
 # パスワードの検証
 def validate_password(password):
@@ -44,50 +97,51 @@ def validate_password(password):
     return False
 
 # ログインページのルート
-@app.route("/", methods=["GET", "POST"])
+@bp.route("/", methods=["GET", "POST"])
 def login(): 
+    from forms import LoginForm  # WTForms（email-validator を含む）はフォームの画面を最初に開くまで読み込まない
     form = LoginForm()
     if form.validate_on_submit():
         employee_number = form.employee_number.data
         password = form.password.data
         user = User.query.filter_by(employee_number=employee_number).first()
-        if user and user.check_password(password):
+        if user and user.check_password(password) and user.is_active:
             login_user(user)
-            return redirect(url_for("index"))
+            return redirect(url_for("main.index"))
         else:
             flash("無効な社員番号またはパスワードです。", "danger")
     return render_template("login_form.html", form=form)
 
 
 # ログアウトのルート
-@app.route("/logout")
+@bp.route("/logout")
 @login_required
 def logout():
     logout_user()
     flash("ログアウトしました")
-    return redirect(url_for("login"))
+    return redirect(url_for("main.login"))
 
 # トップページのルート
-@app.route('/index')
+@bp.route('/index')
 @login_required
 def index():
     announcements = Announcement.query.all()  # すべてのお知らせを取得
     return render_template('index.html', announcements=announcements)
 
 # 健康登録ページのルート
-@app.route('/health')
+@bp.route('/health')
 @login_required
 def register_health():
     return render_template('register_health.html')
 
 # 健康結果ページのルート
-@app.route('/health_result', methods=['POST'])
+@bp.route('/health_result', methods=['POST'])
 @login_required  
 def health_result():
     temperature = request.form.get('temperature')
     if not temperature:
         flash("体温を入力してください。")
-        return redirect(url_for('register_health'))
+        return redirect(url_for('main.register_health'))
     
     throat = request.form.get('throat')
     fever = request.form.get('fever')
@@ -109,19 +163,39 @@ def health_result():
     if temperature >= 37.2 or throat != "normal" or fever != "normal" or cough != "no" or selected_parts_json != "":
         Healthflag = 1
 
-    # 健康記録をデータベースに保存
-    new_record = HealthRecord(
-        user_id=current_user.id,
-        temperature=temperature,
-        throat=throat,
-        fever=fever,
-        cough=cough,
-        selected_parts=selected_parts_sum,
-        flag=Healthflag
-    )
-    
-    db.session.add(new_record)
-    db.session.commit()
+    # 本日の登録状況（未登録は 2）を取得し、変化があれば管理者画面へ通知する
+    now = datetime.now(ZoneInfo('Asia/Tokyo'))
+    today = now.strftime('%Y-%m-%d')
+    health_session = health_shards.session_for(current_user.department)  # 部署ごとのシャードに書き込む
+    previous_flag = health_session.query(HealthRecord.flag).filter(
+        HealthRecord.user_id == current_user.id,
+        HealthRecord.day == now.date()
+    ).scalar()
+    if previous_flag is None:
+        previous_flag = 2
+
+    # 健康記録をデータベースに保存（本日分が登録済みの場合は修正履歴に移して上書きする）
+    upsert_daily_record(health_session, current_user.id, now.date(), {
+        'temperature': temperature,
+        'throat': throat,
+        'fever': fever,
+        'cough': cough,
+        'selected_parts': selected_parts_sum,
+        'date': now,
+        'flag': Healthflag,
+    })
+    health_session.commit()
+
+    if Healthflag == 1 or Healthflag != previous_flag:
+        event_hub.publish({
+            'type': 'health',
+            'user_id': current_user.id,
+            'flag': Healthflag,
+            'date': today,
+            'employee_number': current_user.employee_number,
+            'name': current_user.name,
+            'department_name': get_japanese_department_name(current_user.department),
+        })
 
     # 結果データをセッションに保存し、リダイレクト
     session['result_data'] = {
@@ -131,10 +205,10 @@ def health_result():
         'cough': 'ない' if cough == "no" else 'ある',
         'selected_parts': 'なし' if selected_parts_sum == "" else selected_parts_sum,
     }
-    return redirect(url_for('display_health_result'))
+    return redirect(url_for('main.display_health_result'))
 
 # 健康結果ページのルート
-@app.route('/display_health_result')
+@bp.route('/display_health_result')
 @login_required
 def display_health_result():
     result_data = session.get('result_data', {})
@@ -142,7 +216,7 @@ def display_health_result():
 
 
 # 社員情報閲覧ページのルート
-@app.route("/view_employee", methods=["GET"])
+@bp.route("/view_employee", methods=["GET"])
 @login_required
 def view_employee():
     check_result = check_admin_permission()  # 権限チェック
@@ -153,30 +227,26 @@ def view_employee():
     date_query = request.args.get('date', '').strip()
     filter_option = request.args.get('filter', 'all').strip()  # デフォルトは "all"
 
-    # 日付が指定されていない場合、今日の日付に設定
+    # 日付が指定されていない場合、日本時間の今日の日付に設定（登録時・SSE の通知の date と同じ日付）
     if not date_query:
-        date_query = datetime.now().strftime('%Y-%m-%d')
+        date_query = jst_day(datetime.now(ZoneInfo('Asia/Tokyo'))).strftime('%Y-%m-%d')
     # `date_query` を datetime 型に変換
     date_query_obj = datetime.strptime(date_query, '%Y-%m-%d').date()
 
     # 部署テーブルとエイリアスを結合
     department_alias = aliased(Department)
 
-    # ベースクエリ
+    # ベースクエリ（体調記録は部署ごとのシャードにあるため、社員とは別に取得して結合する）
     base_query = (
         db.session.query(
             User.id,
             User.employee_number,
             User.department,
             User.name,
-            func.coalesce(HealthRecord.flag, literal(2)).label('flag'),  # 未登録者は flag=2
             department_alias.name.label('department_name')
         )
-        .outerjoin(HealthRecord, and_(
-            HealthRecord.user_id == User.id,
-            func.date(HealthRecord.date) == date_query_obj  # 本日の日付でフィルタ
-        ))
         .outerjoin(department_alias, User.department == department_alias.abbreviation)
+        .filter(User.is_active)
         .filter(
             or_(
                 User.employee_number.like(f'%{query}%'),
@@ -186,28 +256,29 @@ def view_employee():
         )
     )
 
+    # 指定日の体調フラグをすべてのシャードから並列に取得（社員ごとに1日1件）
+    def daily_flags(session):
+        return session.query(HealthRecord.user_id, HealthRecord.flag).filter(
+            HealthRecord.day == date_query_obj
+        ).all()
+
+    flags = {}
+    for rows in health_shards.fan_out(daily_flags):
+        flags.update(rows)
+
+    # 社員ごとの体調フラグ（未登録者は flag=2）
+    employees = [dict(row._mapping, flag=flags.get(row.id, 2)) for row in base_query.all()]
+
     # セレクトボックスによるフィルタリング
-    if filter_option == "all":
-        # 全員（特にフィルタなし）
-        pass
-    elif filter_option == "unregistered":
+    if filter_option == "unregistered":
         # 未登録者（HealthRecord が存在しないユーザー）
-        base_query = base_query.filter(HealthRecord.id.is_(None))
+        employees = [employee for employee in employees if employee['flag'] == 2]
     elif filter_option == "healthy":
         # 正常な社員（登録済みかつ HealthRecord.flag=0 のユーザー）
-        base_query = base_query.filter(and_(
-            HealthRecord.flag == 0,
-            HealthRecord.id.isnot(None)  # データが存在することを確認
-        ))
+        employees = [employee for employee in employees if employee['flag'] == 0]
     elif filter_option == "unwell":
         # 体調不良者（登録済みかつ HealthRecord.flag=1 のユーザー）
-        base_query = base_query.filter(and_(
-            HealthRecord.flag == 1,
-            HealthRecord.id.isnot(None)  # データが存在することを確認
-        ))
-
-    # 結果を取得（重複なし）
-    employees = base_query.distinct(User.id).all()
+        employees = [employee for employee in employees if employee['flag'] == 1]
 
     if not employees:
         flash('指定された社員は見つかりませんでした。', 'info')
@@ -220,37 +291,43 @@ def view_employee():
     )
 
 
+# 社員一覧のライブ更新（Server-Sent Events）
+@bp.route('/api/events/roster')
+@login_required
+def roster_events():
+    if not current_user.is_admin:
+        return jsonify({"error": "Unauthorized access"}), 403
+
+    q = event_hub.subscribe()
+    return Response(
+        event_hub.stream(q),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 # 特定の社員の体温データAPIのルート
-@app.route('/api/employee/<int:user_id>/temperature_data', methods=['GET'])
+@bp.route('/api/employee/<int:user_id>/temperature_data', methods=['GET'])
 @login_required
 def get_employee_temperature_data(user_id):
     if current_user.id != user_id and not current_user.is_admin:
         return jsonify({"error": "Unauthorized access"}), 403
 
-    # 現在の日時を取得し、明後日の日付を計算
-    end_date = datetime.now(pytz.utc) + timedelta(days=1)  # 明後日
-    start_date = end_date - timedelta(days=7)  # 明後日から過去7日間
+    start_date, end_date = get_period_range(request.args.get('period', '1w'))
 
-    period = request.args.get('period', '1w')
-    if period == '2w':
-        start_date = end_date - timedelta(weeks=2)
-    elif period == '1m':
-        start_date = end_date - timedelta(days=30)
-    elif period == '3m':
-        start_date = end_date - timedelta(weeks=12)
-    elif period == '1y':
-        start_date = end_date - timedelta(weeks=52)
+    # 表示解像度（day / week / month / auto）
+    requested_resolution = request.args.get('resolution', 'auto')
 
-    jst = pytz.timezone('Asia/Tokyo')
+    jst = ZoneInfo('Asia/Tokyo')
     start_date_jst = start_date.astimezone(jst)
     end_date_jst = end_date.astimezone(jst)
 
-    # 指定した期間の体温データを取得
-    records = HealthRecord.query.filter(
+    # 指定した期間の体温データを取得（必要な列のみ。社員ごとに1日1件）
+    start_day, end_day = start_date_jst.date(), end_date_jst.date()
+    records = get_health_session(user_id).query(HealthRecord.day, HealthRecord.temperature).filter(
         HealthRecord.user_id == user_id,
-        HealthRecord.date >= start_date,
-        HealthRecord.date <= end_date
-    ).order_by(HealthRecord.date).all()
+        HealthRecord.day.between(start_day, end_day)
+    ).all()
     labels = []
     current_date = start_date_jst
 
@@ -258,45 +335,97 @@ def get_employee_temperature_data(user_id):
         labels.append(current_date.strftime('%Y-%m-%d'))
         current_date += timedelta(days=1)
 
-    data = [record.temperature for record in records]
-    jst_dates = [record.date.astimezone(jst).strftime('%Y-%m-%d') for record in records]
+    # 日付ごとの体温
+    temperatures_by_date = {day.strftime('%Y-%m-%d'): temperature for day, temperature in records}
 
-    # 各日付の平均温度を計算
-    average_temperatures = {}
-    all_records = HealthRecord.query.filter(
-        HealthRecord.date >= start_date,
-        HealthRecord.date <= end_date
-    ).all()
+    # 各日付の平均温度を計算（シャードごとに日付別の合計・件数を並列に集計してから合算）
+    def daily_totals(session):
+        return session.query(HealthRecord.day, func.sum(HealthRecord.temperature), func.count()).filter(
+            HealthRecord.day.between(start_day, end_day)
+        ).group_by(HealthRecord.day).all()
 
-    for record in all_records:
-        date_str = record.date.astimezone(jst).strftime('%Y-%m-%d')
-        if date_str not in average_temperatures:
-            average_temperatures[date_str] = []
-        average_temperatures[date_str].append(float(record.temperature))
+    average_temperatures = {}
+    for totals in health_shards.fan_out(daily_totals):
+        for day, temperature_sum, count in totals:
+            total = average_temperatures.setdefault(day.strftime('%Y-%m-%d'), [0.0, 0])
+            total[0] += temperature_sum
+            total[1] += count
 
     average_data = [
-        sum(average_temperatures[date]) / len(average_temperatures[date]) if date in average_temperatures else None
+        average_temperatures[date][0] / average_temperatures[date][1] if date in average_temperatures else None
         for date in labels
     ]
 
     # 体温データをラベルに関連付け
-    data_jst = []
+    data_jst = [temperatures_by_date.get(label) for label in labels]
 
-    for label in labels:
-        if label in jst_dates:
-            index = jst_dates.index(label)
-            data_jst.append(data[index])
-        else:
-            data_jst.append(None)  # データがない場合はNoneを追加
-    
     del labels[0]
     del data_jst[0]
     del average_data[0]
 
-    return jsonify({'labels': labels, 'data': data_jst, 'average': average_data})
+    # 長期間は週・月単位に集約してポイント数を抑える
+    resolution = choose_resolution(labels, requested_resolution)
+    if resolution == 'day':
+        return jsonify({'labels': labels, 'data': data_jst, 'average': average_data, 'resolution': resolution})
+
+    bucket_labels, data_mean, data_min, data_max = downsample(labels, data_jst, resolution)
+    average_mean = downsample(labels, average_data, resolution)[1]
+
+    return jsonify({
+        'labels': bucket_labels,
+        'data': data_mean,
+        'min': data_min,
+        'max': data_max,
+        'average': average_mean,
+        'resolution': resolution
+    })
+
+# 特定の社員の表示期間分の体調詳細APIのルート（グラフのクリック用）
+@bp.route('/api/employee/<int:user_id>/health_details', methods=['GET'])
+@login_required
+def get_employee_health_details(user_id):
+    if current_user.id != user_id and not current_user.is_admin:
+        return jsonify({"error": "Unauthorized access"}), 403
+
+    period = request.args.get('period', '1w')
+    # 詳細は日単位で表示する期間（グラフが週・月単位に集約されない期間）のみ返す
+    if not is_daily_period(period):
+        return jsonify({"error": "Period too long for daily details"}), 400
+
+    start_date, end_date = get_period_range(period)
+    jst = ZoneInfo('Asia/Tokyo')
+    start_day, end_day = start_date.astimezone(jst).date(), end_date.astimezone(jst).date()
+
+    records = get_health_session(user_id).query(
+        HealthRecord.day,
+        HealthRecord.date,
+        HealthRecord.temperature,
+        HealthRecord.throat,
+        HealthRecord.fever,
+        HealthRecord.cough,
+        HealthRecord.selected_parts
+    ).filter(
+        HealthRecord.user_id == user_id,
+        HealthRecord.day.between(start_day, end_day)
+    ).order_by(HealthRecord.day).all()
+
+    # 日付（JST）ごとの列形式で返す。症状は 0=正常 / 1=異常 のコードと labels で表す
+    details = {'days': [], 'time': [], 'temperature': [], 'selected_parts': []}
+    details.update({column: [] for column in SYMPTOM_LABELS})
+    for record in records:
+        details['days'].append(record.day.strftime('%Y-%m-%d'))
+        details['time'].append(jst_datetime(record.date).strftime('%H:%M:%S'))
+        details['temperature'].append(record.temperature)
+        for column, (normal_value, _) in SYMPTOM_LABELS.items():
+            details[column].append(0 if getattr(record, column) == normal_value else 1)
+        parts = record.selected_parts
+        details['selected_parts'].append(', '.join(parts) if isinstance(parts, list) else (parts or ''))
+    details['labels'] = {column: labels for column, (_, labels) in SYMPTOM_LABELS.items()}
+
+    return jsonify(details)
 
 # 特定の社員の健康記録を取得するAPIのルート
-@app.route('/api/health_record', methods=['GET'])
+@bp.route('/api/health_record', methods=['GET'])
 def get_health_record():
     try:
         # クエリパラメータを取得
@@ -305,15 +434,10 @@ def get_health_record():
         end = request.args.get('end') 
 
         # ISO8601形式の文字列をUTC日時に変換
-        start_dt_utc = datetime.strptime(start, '%Y-%m-%dT%H:%M:%S.%fZ').replace(tzinfo=pytz.utc)
-        end_dt_utc = datetime.strptime(end, '%Y-%m-%dT%H:%M:%S.%fZ').replace(tzinfo=pytz.utc)
+        start_dt_utc = datetime.strptime(start, '%Y-%m-%dT%H:%M:%S.%fZ').replace(tzinfo=timezone.utc)
+        end_dt_utc = datetime.strptime(end, '%Y-%m-%dT%H:%M:%S.%fZ').replace(tzinfo=timezone.utc)
 
-        # UTCをJSTに変換
-        jst = pytz.timezone('Asia/Tokyo')
-        start_dt_jst = start_dt_utc
-        end_dt_jst = end_dt_utc
-        
-        health_records = HealthRecord.query.filter(
+        health_records = get_health_session(user_id).query(HealthRecord).filter(
             HealthRecord.user_id == user_id,
             HealthRecord.date >= start_dt_utc,
             HealthRecord.date <= end_dt_utc
@@ -323,6 +447,22 @@ def get_health_record():
         if not health_records:
             return jsonify({"error": "No health records found"}), 404
 
+        # 列形式が要求された場合は、キーとラベルを繰り返さない配列の配列で返す
+        if wants_columnar():
+            columns = ['temperature', *SYMPTOM_LABELS, 'selected_parts', 'date']
+            rows = [
+                [
+                    record.temperature,
+                    *(0 if getattr(record, column) == normal_value else 1
+                      for column, (normal_value, _) in SYMPTOM_LABELS.items()),
+                    record.selected_parts or '',
+                    jst_datetime(record.date).strftime('%Y-%m-%d %H:%M:%S')
+                ]
+                for record in health_records
+            ]
+            labels = {column: labels for column, (_, labels) in SYMPTOM_LABELS.items()}
+            return columnar_response(columnar(columns, rows, labels))
+
         # レスポンス作成
         response_data = []
         for record in health_records:
@@ -332,34 +472,54 @@ def get_health_record():
             'fever': "ない" if record.fever == "normal" else "高い",
             'cough': "ない" if record.cough == "no" else "ある",
             'selected_parts': record.selected_parts or 'なし',
-            'date': record.date.astimezone(jst).strftime('%Y-%m-%d %H:%M:%S')  # JST形式
+            'date': jst_datetime(record.date).strftime('%Y-%m-%d %H:%M:%S')  # JST形式
         })
 
         return jsonify(response_data)
 
     except ValueError:
         return jsonify({"error": "Invalid parameters"}), 400
+
+
+# 変更フィードAPIのルート（人事・安全管理システムの差分同期用）
+@bp.route('/api/changes', methods=['GET'])
+def get_changes():
+    if not is_authorized():
+        return jsonify({"error": "Unauthorized access"}), 403
+
+    # 1回に返す件数（既定 500 件、最大 1000 件）
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    try:
+        page = read_changes(request.args.get('cursor'), limit)
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    if wants_columnar():
+        return columnar_response(columnar_changes(page))
+    return jsonify(page)
     
 
 # 管理者画面のルート
-@app.route("/admin")
+@bp.route("/admin")
 @login_required
 def admin():
     # 総社員数を取得
-    total_employees = User.query.count()
+    total_employees = User.query.filter_by(is_active=True).count()
     # 管理者の総数を取得
-    total_admins = User.query.filter_by(is_admin=True).count()
+    total_admins = User.query.filter_by(is_admin=True, is_active=True).count()
 
     return render_template('admin.html', total_employees=total_employees, total_admins=total_admins)
 
 # 社員登録ページのルート
-@app.route("/add_employee", methods=["GET", "POST"])
+@bp.route("/add_employee", methods=["GET", "POST"])
 @login_required
 def add_employee():
     check_result = check_admin_permission()  # 権限チェック
     if check_result:
         return check_result  # アクセス拒否の場合はリダイレクト
 
+    from forms import AddEmployeeForm
     form = AddEmployeeForm()
 
     if form.validate_on_submit():
@@ -408,7 +568,7 @@ def add_employee():
     return render_template('add_employee.html', form=form)
 
 # 社員削除ページのルート
-@app.route('/delete_employee', methods=['GET', 'POST'])
+@bp.route('/delete_employee', methods=['GET', 'POST'])
 @login_required
 def delete_employee():
     check_result = check_admin_permission()  # 権限チェック
@@ -426,7 +586,7 @@ def delete_employee():
 
         if not employee:
             flash('指定された社員番号は見つかりませんでした。', 'error')
-            return redirect(url_for('delete_employee'))  # フォームを再表示
+            return redirect(url_for('main.delete_employee'))  # フォームを再表示
 
         # 日本語の部署名を取得
         department = Department.query.filter_by(abbreviation=employee.department).first()
@@ -434,9 +594,8 @@ def delete_employee():
         employee_name = employee.name  # 社員名を取得
 
         if action == 'delete':
-            # 削除処理を実行
-            db.session.delete(employee)
-            db.session.commit()
+            # 削除処理を実行（体調記録はアーカイブに移す）
+            retire_employees([employee.id], mode='delete', records='archive')
 
             # 削除結果ページにリダイレクト
             return render_template(
@@ -448,22 +607,222 @@ def delete_employee():
     # GET リクエストの場合、またはPOSTで検索した社員情報を表示
     return render_template('delete_employee.html', employee=employee, department_name_jp=department_name_jp)
 
+# 社員一括無効化・削除ページのルート
+@bp.route('/bulk_employees', methods=['GET', 'POST'])
+@login_required
+def bulk_employees():
+    check_result = check_admin_permission()  # 権限チェック
+    if check_result:
+        return check_result  # アクセス拒否の場合はリダイレクト
+
+    departments = Department.query.all()
+    employee_numbers_text = request.form.get('employee_numbers', '')
+    department = request.form.get('department', '')
+    mode = request.form.get('mode', 'deactivate')
+    records = request.form.get('records', 'archive')
+    employees = []
+
+    if request.method == 'POST':
+        if mode not in MODES or records not in RECORD_ACTIONS:
+            flash('処理の指定が正しくありません。', 'error')
+            return redirect(url_for('main.bulk_employees'))
+
+        user_ids = find_employee_ids(parse_employee_numbers(employee_numbers_text), department)
+        if not user_ids:
+            flash('対象の社員が見つかりませんでした。', 'error')
+        elif request.form.get('action') == 'execute':
+            if mode == 'delete' and records == 'keep':
+                flash('社員を削除する場合は、体調記録をアーカイブまたは削除してください。', 'error')
+            else:
+                # 人数が多いとリクエスト内では終わらないため、バックグラウンドジョブで実行する
+                job = jobs.enqueue('retire_employees', {
+                    'user_ids': user_ids, 'mode': mode, 'records': records
+                }, current_user.id)
+                return redirect(url_for('main.job_detail', job_id=job.id))
+        else:
+            # 実行前の確認用に対象社員を表示
+            employees = (
+                db.session.query(User.employee_number, User.name, Department.name.label('department_name'))
+                .outerjoin(Department, User.department == Department.abbreviation)
+                .filter(User.id.in_(user_ids))
+                .order_by(User.employee_number)
+                .all()
+            )
+
+    return render_template(
+        'bulk_employees.html',
+        departments=departments,
+        employees=employees,
+        employee_numbers=employee_numbers_text,
+        department=department,
+        mode=mode,
+        records=records
+    )
+
+# バックグラウンドジョブ一覧ページのルート
+@bp.route('/admin/jobs', methods=['GET'])
+@login_required
+def job_list():
+    check_result = check_admin_permission()  # 権限チェック
+    if check_result:
+        return check_result  # アクセス拒否の場合はリダイレクト
+
+    recent_jobs = Job.query.order_by(Job.id.desc()).limit(50).all()
+    return render_template('jobs.html', jobs=[job_to_dict(job) for job in recent_jobs])
+
+# 体調記録の CSV 出力ジョブ登録のルート
+@bp.route('/admin/jobs/export', methods=['POST'])
+@login_required
+def export_health_records():
+    check_result = check_admin_permission()  # 権限チェック
+    if check_result:
+        return check_result  # アクセス拒否の場合はリダイレクト
+
+    start = request.form.get('start', '').strip()
+    end = request.form.get('end', '').strip()
+    try:
+        for value in (start, end):
+            if value:
+                datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        flash('期間の指定が正しくありません。', 'error')
+        return redirect(url_for('main.job_list'))
+
+    job = jobs.enqueue('export_health_records', {'start': start, 'end': end}, current_user.id)
+    return redirect(url_for('main.job_detail', job_id=job.id))
+
+# バックグラウンドジョブ詳細ページのルート
+@bp.route('/admin/jobs/<int:job_id>', methods=['GET'])
+@login_required
+def job_detail(job_id):
+    check_result = check_admin_permission()  # 権限チェック
+    if check_result:
+        return check_result  # アクセス拒否の場合はリダイレクト
+
+    job = Job.query.get_or_404(job_id)
+    return render_template('job_detail.html', job=job_to_dict(job))
+
+# バックグラウンドジョブの状態APIのルート（詳細ページから定期的に取得する）
+@bp.route('/api/jobs/<int:job_id>', methods=['GET'])
+@login_required
+def get_job_status(job_id):
+    if not current_user.is_admin:
+        return jsonify({"error": "Unauthorized access"}), 403
+
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job_to_dict(job))
+
+# バックグラウンドジョブの結果ファイルのダウンロード
+@bp.route('/admin/jobs/<int:job_id>/result', methods=['GET'])
+@login_required
+def download_job_result(job_id):
+    check_result = check_admin_permission()  # 権限チェック
+    if check_result:
+        return check_result  # アクセス拒否の場合はリダイレクト
+
+    job = Job.query.get_or_404(job_id)
+    if job.status != 'done' or not (job.result or {}).get('file'):
+        flash('ダウンロードできる結果がありません。', 'error')
+        return redirect(url_for('main.job_detail', job_id=job_id))
+    path = os.path.join(current_app.config['JOB_RESULT_DIR'], os.path.basename(job.result['file']))
+    return send_file(path, as_attachment=True, download_name=job.result['file'])
+
+# 未登録者ダイジェストの対象のスナップショット（snapshot（ID）または day・cutoff。指定がなければ本日の最新の締め時刻）
+def requested_snapshot():
+    if request.args.get('snapshot'):
+        return db.session.get(ReminderSnapshot, int(request.args['snapshot']))
+    day = request.args.get('day')
+    cutoff = request.args.get('cutoff')
+    if not day and not cutoff:
+        return current_snapshot()
+    day = datetime.strptime(day, '%Y-%m-%d').date() if day else datetime.now(ZoneInfo('Asia/Tokyo')).date()
+    if not cutoff:
+        raise ValueError('cutoff is required')
+    return find_snapshot(day, cutoff)
+
+# 部署ごとの未登録者ダイジェストページのルート
+@bp.route('/admin/reminders', methods=['GET'])
+@login_required
+def reminders():
+    check_result = check_admin_permission()  # 権限チェック
+    if check_result:
+        return check_result  # アクセス拒否の場合はリダイレクト
+
+    department = request.args.get('department', '')
+    error = None
+    try:
+        snapshot = requested_snapshot()
+    except ValueError:
+        snapshot = None
+        error = '対象日・締め時刻の指定が正しくありません。'
+
+    # 本日の最新の締め時刻の集計がまだない場合（cron の実行前など）は、その旨を表示する
+    pending_cutoff = None
+    if not error and not any(request.args.get(key) for key in ('snapshot', 'day', 'cutoff')):
+        latest_cutoff = due_cutoff()
+        if latest_cutoff and (snapshot is None or snapshot.cutoff != latest_cutoff):
+            pending_cutoff = latest_cutoff
+
+    digest = snapshot_digest(snapshot, department) if snapshot else {}
+    snapshots = ReminderSnapshot.query.order_by(ReminderSnapshot.day.desc(), ReminderSnapshot.cutoff.desc()).limit(20).all()
+    departments = Department.query.order_by(Department.id).all()
+    return render_template(
+        'reminders.html',
+        snapshot=snapshot,
+        snapshots=snapshots,
+        digest=digest,
+        department=department,
+        departments=departments,
+        department_names={d.abbreviation: d.name for d in departments},
+        cutoffs=current_app.config['REMINDER_CUTOFFS'],
+        pending_cutoff=pending_cutoff,
+        error=error,
+    )
+
+# 部署ごとの未登録者ダイジェストAPIのルート（定期的に取得する画面・ツール用）
+@bp.route('/api/reminders', methods=['GET'])
+@login_required
+def get_reminders():
+    if not current_user.is_admin:
+        return jsonify({"error": "Unauthorized access"}), 403
+
+    department = request.args.get('department', '')
+    try:
+        snapshot = requested_snapshot()
+    except ValueError:
+        return jsonify({"error": "Invalid parameters"}), 400
+    if snapshot is None:
+        return jsonify({'snapshot': None, 'departments': {}})
+
+    # 同じスナップショットは内容が変わらないため、ETag で再取得を省けるようにする
+    response = jsonify({
+        'snapshot': snapshot_to_dict(snapshot),
+        'departments': snapshot_digest(snapshot, department),
+    })
+    response.set_etag(f'reminders-{snapshot.id}-{department}')
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
 # 特定の社員の体温グラフページのルート
 # 一般ユーザーは自分のみ
-@app.route('/employee/<int:employee_id>/graph', methods=['GET'])
+@bp.route('/employee/<int:employee_id>/graph', methods=['GET'])
 @login_required
 def employee_graph(employee_id):
     if not current_user.is_admin and current_user.id != employee_id:
         flash("このグラフにアクセスする権限がありません。", "error")
-        return redirect(url_for('view_employee'))  # Redirect to employee view if unauthorized
+        return redirect(url_for('main.view_employee'))  # Redirect to employee view if unauthorized
 
     employee = User.query.get_or_404(employee_id)
-    return render_template('graph.html', employee=employee)
+    daily_periods = [period for period in GRAPH_PERIODS if is_daily_period(period)]
+    return render_template('graph.html', employee=employee, daily_periods=daily_periods)
 
 # 基本情報変更ページのルート
-@app.route('/change_info/<int:employee_id>', methods=['GET', 'POST'])
+@bp.route('/change_info/<int:employee_id>', methods=['GET', 'POST'])
 @login_required
 def change_info(employee_id):
+    from forms import EmployeeForm
     form = EmployeeForm()
 
     form.department.choices = [
@@ -480,6 +839,7 @@ def change_info(employee_id):
         return check_result  # アクセス拒否の場合はリダイレクト
 
     if request.method == 'POST' and form.validate_on_submit():
+        old_department = employee.department
         employee.employee_number = form.employee_id.data
         employee.department = form.department.data
         employee.name = form.name.data
@@ -488,7 +848,8 @@ def change_info(employee_id):
         employee.is_admin = form.admin_rights.data  # 管理者権限の更新
 
         try:
-            db.session.commit()
+            # 異動した場合は体調記録を異動先の部署のシャードにコピーしてから変更をコミットし、元のシャードから消す
+            health_shards.move_records(employee.id, old_department, employee.department, commit=db.session.commit)
             
             # 部署名を取得
             department_name = Department.query.filter_by(abbreviation=employee.department).first()
@@ -502,9 +863,9 @@ def change_info(employee_id):
 
         except Exception as e:
             db.session.rollback()
-            app.logger.error(f'情報の更新中にエラーが発生しました: {e}')
+            current_app.logger.error(f'情報の更新中にエラーが発生しました: {e}')
             flash('情報の更新中にエラーが発生しました。再試行してください。', 'danger')
-            return redirect(url_for('change_info', employee_id=employee.id))
+            return redirect(url_for('main.change_info', employee_id=employee.id))
 
     form.employee_id.data = employee.employee_number
     form.department.data = employee.department
@@ -516,13 +877,13 @@ def change_info(employee_id):
     return render_template('change_info.html', form=form)
 
 #パスワード変更のルート
-@app.route('/change_password/<int:employee_id>', methods=['GET', 'POST'])
+@bp.route('/change_password/<int:employee_id>', methods=['GET', 'POST'])
 @login_required
 def change_password(employee_id):
     employee = User.query.get(employee_id)
     if employee is None:
         flash('社員が見つかりません。', 'danger')
-        return redirect(url_for('view_employee'))
+        return redirect(url_for('main.view_employee'))
 
     if request.method == 'POST':
         new_password = request.form.get('new_password')
@@ -531,34 +892,34 @@ def change_password(employee_id):
         # パスワードの長さを確認
         if len(new_password) < 4 or len(new_password) > 16:
             flash('パスワードは4文字以上16文字以下である必要があります。', 'danger')
-            return redirect(url_for('change_password', employee_id=employee_id))
+            return redirect(url_for('main.change_password', employee_id=employee_id))
 
         # 小文字と数字が含まれているか確認
         if not re.search(r'[a-z]', new_password) or not re.search(r'[0-9]', new_password):
             flash('パスワードには少なくとも1つの小文字と1つの数字を含める必要があります。', 'danger')
-            return redirect(url_for('change_password', employee_id=employee_id))
+            return redirect(url_for('main.change_password', employee_id=employee_id))
 
         # パスワードの一致を確認
         if new_password != confirm_password:
             flash('新しいパスワードと確認用パスワードが一致しません。', 'danger')
-            return redirect(url_for('change_password', employee_id=employee_id))
+            return redirect(url_for('main.change_password', employee_id=employee_id))
 
         # パスワードを設定
         employee.set_password(new_password)
         db.session.commit()
 
-        return redirect(url_for('change_password_result'))  # 結果ページにリダイレクト
+        return redirect(url_for('main.change_password_result'))  # 結果ページにリダイレクト
 
     return render_template('change_password.html', employee=employee)
 
 # パスワード変更結果ページのルート
-@app.route('/change_password/result')
+@bp.route('/change_password/result')
 @login_required
 def change_password_result():
     return render_template('change_password_result.html')
 
 # 基本情報変更ページのルート
-@app.route("/update_employee_info", methods=["GET", "POST"])
+@bp.route("/update_employee_info", methods=["GET", "POST"])
 @login_required
 def update_employee_info():
     check_result = check_admin_permission()  # 権限チェック
@@ -571,19 +932,19 @@ def update_employee_info():
         employee_to_update = User.query.filter_by(employee_number=employee_number).first()
 
         if employee_to_update:
-            return redirect(url_for('change_info', employee_id=employee_to_update.id))
+            return redirect(url_for('main.change_info', employee_id=employee_to_update.id))
         else:
             flash('指定された社員番号は見つかりませんでした。', 'error')
 
     return render_template('update_employee_info.html', employee=employee_to_update)
 
 # お知らせ管理ページ
-@app.route('/admin/announcements', methods=['GET', 'POST'])
+@bp.route('/admin/announcements', methods=['GET', 'POST'])
 @login_required
 def manage_announcements():
     if not current_user.is_admin:
         flash("管理者のみアクセス可能です。", "error")
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
     
     if request.method == 'POST':
         title = request.form['title']
@@ -594,33 +955,43 @@ def manage_announcements():
         db.session.commit()
         
         flash("お知らせを作成しました。", "success")
-        return redirect(url_for('manage_announcements'))
+        return redirect(url_for('main.manage_announcements'))
     
     announcements = Announcement.query.order_by(Announcement.date.desc()).all()
     return render_template('manage_announcements.html', announcements=announcements)
 
 # お知らせ削除
-@app.route('/admin/announcements/delete/<int:id>', methods=['POST'])
+@bp.route('/admin/announcements/delete/<int:id>', methods=['POST'])
 @login_required
 def delete_announcement(id):
     if not current_user.is_admin:
         flash("管理者のみアクセス可能です。", "error")
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
     
     announcement = Announcement.query.get_or_404(id)
     db.session.delete(announcement)
     db.session.commit()
     
     flash("お知らせを削除しました。", "success")
-    return redirect(url_for('manage_announcements'))
+    return redirect(url_for('main.manage_announcements'))
 
 # 404エラーのハンドリング
-@app.errorhandler(404)
+@bp.app_errorhandler(404)
 def page_not_found(e):
     return render_template('404.html'), 404
 
 # 401エラーのハンドリング
-@app.errorhandler(401)
+@bp.app_errorhandler(401)
 def unauthorized_error(error):
     flash("認証に失敗しました。ログイン画面に戻ります。", "error")
-    return redirect(url_for('login'))
\ No newline at end of file
+    return redirect(url_for('main.login'))
+
+# データベースの書き込みロック待ちがタイムアウトした場合のハンドリング
+@bp.app_errorhandler(OperationalError)
+def database_error(error):
+    db.session.rollback()
+    if 'database is locked' in str(error):
+        current_app.logger.warning('データベースの書き込みロック待ちがタイムアウトしました (database is locked)')
+        return '混雑しています。しばらくしてから再度お試しください。(database is locked)', 503, {'Retry-After': '5'}
+    current_app.logger.exception('データベースエラーが発生しました')
+    return 'データベースエラーが発生しました。', 500
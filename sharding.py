@@ -0,0 +1,307 @@
+# sharding.py
+import glob
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import click
+from flask import current_app, g
+from flask.cli import with_appcontext
+from sqlalchemy import create_engine, delete, event, insert, inspect, select, text
+from sqlalchemy.orm import Session
+
+SHARD_FILE_PREFIX = 'health_'
+DEFAULT_SHARD = 'default'  # 部署が不明な社員の保存先
+
+
+def parse_shard_map(value):
+    """'hr:tokyo,it:tokyo,sales:osaka' 形式の文字列を {部署: シャード名} にする"""
+    if not value:
+        return {}
+    if isinstance(value, dict):
+        return dict(value)
+    pairs = (item.split(':', 1) for item in value.split(',') if ':' in item)
+    return {department.strip(): shard.strip() for department, shard in pairs}
+
+
+class HealthShards:
+    """体調記録（HealthRecord / HealthRecordArchive / HealthRecordRevision）を部署ごとの SQLite ファイルに分割して保存する
+
+    HEALTH_SHARD_DIR を設定すると、体調記録は HEALTH_SHARD_DIR/health_<シャード名>.db に保存され、
+    部署ごとに書き込みロックが分かれる。User・Department・Announcement は従来のデータベースに残す。
+    シャード名は部署の略称（HEALTH_SHARD_MAP で拠点ごとにまとめることもできる）。
+    未設定の場合は session_for / fan_out とも db.session をそのまま使う。
+    """
+
+    def __init__(self, app=None):
+        self.shard_dir = None
+        self.shard_map = {}
+        self.max_workers = 8
+        self._engines = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('HEALTH_SHARD_DIR', None)
+        app.config.setdefault('HEALTH_SHARD_MAP', {})
+        app.config.setdefault('HEALTH_SHARD_WORKERS', 8)
+        shard_dir = app.config['HEALTH_SHARD_DIR']
+        self.shard_dir = os.path.abspath(shard_dir) if shard_dir else None
+        self.shard_map = parse_shard_map(app.config['HEALTH_SHARD_MAP'])
+        self.max_workers = app.config['HEALTH_SHARD_WORKERS']
+        self.busy_timeout_ms = app.config.get('SQLITE_BUSY_TIMEOUT_MS', 5000)
+        self._engines = {}
+        if self.shard_dir:
+            os.makedirs(self.shard_dir, exist_ok=True)
+        app.teardown_appcontext(self._close_sessions)
+        app.extensions['health_shards'] = self
+
+    @property
+    def enabled(self):
+        return self.shard_dir is not None
+
+    def shard_name(self, department):
+        """部署（略称）から保存先のシャード名を決める"""
+        name = self.shard_map.get(department, department) or DEFAULT_SHARD
+        return re.sub(r'[^0-9A-Za-z_-]', '_', name)
+
+    def shard_names(self):
+        """作成済みのシャード名の一覧"""
+        names = {
+            os.path.basename(path)[len(SHARD_FILE_PREFIX):-len('.db')]
+            for path in glob.glob(os.path.join(self.shard_dir, f'{SHARD_FILE_PREFIX}*.db'))
+        }
+        return sorted(names | set(self._engines))
+
+    def engine(self, name):
+        """シャードのエンジンを取得する（初回はテーブルを作成する）"""
+        engine = self._engines.get(name)
+        if engine is not None:
+            return engine
+        with self._lock:
+            if name not in self._engines:
+                from app import set_sqlite_pragma
+                from models import HealthRecord, HealthRecordArchive, HealthRecordRevision, ChangeLog
+
+                path = os.path.join(self.shard_dir, f'{SHARD_FILE_PREFIX}{name}.db')
+                engine = create_engine(f'sqlite:///{path}')
+                event.listen(engine, 'connect', partial(set_sqlite_pragma, self.busy_timeout_ms))
+                tables = [
+                    HealthRecord.__table__, HealthRecordArchive.__table__, HealthRecordRevision.__table__,
+                    ChangeLog.__table__,
+                ]
+                HealthRecord.metadata.create_all(engine, tables=tables)
+                add_missing_columns(engine, tables)
+                self._engines[name] = engine
+            return self._engines[name]
+
+    def session_for(self, department):
+        """部署の体調記録を読み書きするセッション（アプリケーションコンテキストの終了時に閉じる）"""
+        if not self.enabled:
+            return current_app.extensions['sqlalchemy'].session
+        return self.shard_session(self.shard_name(department))
+
+    def shard_session(self, name):
+        """シャード名を指定してセッションを取得する（アプリケーションコンテキストの終了時に閉じる）"""
+        sessions = g.setdefault('_health_shard_sessions', {})
+        if name not in sessions:
+            sessions[name] = Session(self.engine(name))
+        return sessions[name]
+
+    def sources(self):
+        """体調記録の保存先ごとの (シャード名, セッション) の一覧（シャーディングしない場合は [(None, db.session)]）"""
+        if not self.enabled:
+            return [(None, current_app.extensions['sqlalchemy'].session)]
+        return [(name, self.shard_session(name)) for name in self.shard_names()]
+
+    def fan_out(self, fn):
+        """すべてのシャードで fn(session) を並列に実行し、結果のリストを返す
+
+        fn は別スレッドで実行されるため、引数のセッション以外（db.session など）は使わないこと。
+        """
+        if not self.enabled:
+            return [fn(current_app.extensions['sqlalchemy'].session)]
+        return list(self.map_shards(lambda name, session: fn(session)).values())
+
+    def map_shards(self, fn):
+        """すべてのシャードで fn(シャード名, session) を並列に実行し、{シャード名: 結果} を返す（シャーディング時のみ）"""
+        names = self.shard_names()
+        if not names:
+            return {}
+
+        def run(name):
+            with Session(self.engine(name)) as session:
+                return fn(name, session)
+
+        with ThreadPoolExecutor(min(len(names), self.max_workers)) as executor:
+            return dict(zip(names, executor.map(run, names)))
+
+    def move_records(self, user_id, old_department, new_department, commit):
+        """部署を異動した社員の体調記録を異動先のシャードに移し、commit() で社員の部署の変更を確定する
+
+        異動先へのコピーをコミットしてから commit() を呼び、最後に元のシャードから削除する。
+        commit() が失敗した場合は異動先のコピーを消して例外を送出する（記録は元のシャードに残る）。
+        元のシャードからの削除が失敗して残った記録は flask shard-health-records で片付けられる。
+        """
+        if not self.enabled or self.shard_name(old_department) == self.shard_name(new_department):
+            commit()
+            return 0
+
+        moved = 0
+        with Session(self.engine(self.shard_name(old_department))) as source, \
+                Session(self.engine(self.shard_name(new_department))) as target:
+            # 前回途中で失敗した移動の残りを消してから移す（(社員, 日) の一意制約に掛からないように）
+            delete_user_records(target, user_id)
+            for model in moved_models():
+                moved += copy_rows(source, target, model, model.user_id == user_id)
+            target.commit()
+            try:
+                commit()
+            except Exception:
+                delete_user_records(target, user_id)
+                target.commit()
+                raise
+            delete_user_records(source, user_id, record_changes=False)
+            source.commit()
+        return moved
+
+    def dispose(self):
+        """フォーク後に親プロセスの接続を使い回さないよう、すべてのエンジンを破棄する"""
+        for engine in self._engines.values():
+            engine.dispose(close=False)
+
+    def _close_sessions(self, exception=None):
+        for session in g.pop('_health_shard_sessions', {}).values():
+            session.close()
+
+
+def moved_models():
+    """シャード間で移すモデル（社員ごとの体調記録・アーカイブ・修正履歴）"""
+    from models import HealthRecord, HealthRecordArchive, HealthRecordRevision
+    return (HealthRecord, HealthRecordArchive, HealthRecordRevision)
+
+
+def add_missing_columns(engine, tables):
+    """既存のシャードに、後から追加された列（NULL 可）を追加する
+
+    シャードは flask db（alembic）の対象外のため、create_all で作成されない列をここで追加する。
+    """
+    existing = inspect(engine)
+    with engine.begin() as connection:
+        for table in tables:
+            names = {column['name'] for column in existing.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in names and column.nullable:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+
+def delete_user_records(session, user_id, record_changes=True):
+    """シャードから社員の体調記録・アーカイブ・修正履歴を削除する（コミットは呼び出し側）
+
+    record_changes の場合は変更フィード用に記録の削除を残す（copy_rows で記録済みの場合は False）。
+    """
+    from changefeed import log_changes
+    from models import HealthRecord
+
+    if record_changes:
+        record_rows = session.execute(
+            select(HealthRecord.id, HealthRecord.user_id).where(HealthRecord.user_id == user_id)
+        ).all()
+        log_changes(session, 'health_record', record_rows, 'delete')
+    for model in moved_models():
+        session.execute(delete(model).where(model.user_id == user_id))
+
+
+def copy_rows(source, target, model, whereclause, skip_existing=False):
+    """条件に一致する行を別のデータベースに移す（ID はコピー先で採番し直す）
+
+    元の行は削除しないので、呼び出し側でコピー先をコミットしてから削除する。
+    skip_existing の場合は、コピー先に同じ内容の行（体調記録は同じ社員・日の記録）があればコピーしない。
+    体調記録の場合は変更フィード用に、コピー先に追加・元の記録に削除の履歴を残す。
+    """
+    from changefeed import log_changes
+    from models import HealthRecord
+
+    columns = [column for column in model.__table__.columns if column.name != 'id']
+    rows = source.execute(select(model.id, *columns).where(whereclause).order_by(model.id)).mappings().all()
+    if not rows:
+        return 0
+    if skip_existing:
+        def row_key(row):
+            if model is HealthRecord:
+                return row['user_id'], row['day']
+            return tuple(repr(row[column.name]) for column in columns)
+        existing = {row_key(row) for row in target.execute(select(*columns).where(whereclause)).mappings()}
+        copied = [row for row in rows if row_key(row) not in existing]
+    else:
+        copied = rows
+    inserted = []
+    if copied:
+        inserted = target.execute(
+            insert(model.__table__).returning(model.id, model.user_id),
+            [{column.name: row[column.name] for column in columns} for row in copied]
+        ).all()
+    if model is HealthRecord:
+        log_changes(target, 'health_record', inserted, 'upsert')
+        log_changes(source, 'health_record', [(row['id'], row['user_id']) for row in rows], 'delete')
+    return len(copied)
+
+
+@click.command('shard-health-records')
+@click.option('--chunk-size', type=int, default=1000, show_default=True, help='1トランザクションで移す体調記録の件数')
+@with_appcontext
+def shard_health_records_command(chunk_size):
+    """既存の体調記録を部署ごとのシャードに移す（HEALTH_SHARD_DIR の設定後に1回実行する）
+
+    異動の途中で失敗した場合や HEALTH_SHARD_MAP を変更した場合に、社員の現在のシャード以外に残った記録も移す。
+    """
+    from extensions import db, health_shards
+    from models import User, HealthRecord, HealthRecordArchive, HealthRecordRevision
+
+    if not health_shards.enabled:
+        raise click.ClickException('HEALTH_SHARD_DIR が設定されていません。')
+
+    departments = [department for department, in db.session.query(User.department).distinct()]
+    for department in departments:
+        target = health_shards.session_for(department)
+        department_users = select(User.id).where(User.department == department)
+        moved = 0
+        for model in (HealthRecord, HealthRecordArchive, HealthRecordRevision):
+            while True:
+                ids = db.session.scalars(
+                    select(model.id).where(model.user_id.in_(department_users)).order_by(model.id).limit(chunk_size)
+                ).all()
+                if not ids:
+                    break
+                moved += copy_rows(db.session, target, model, model.id.in_(ids))
+                target.commit()  # シャードへの書き込みを確定してから元の記録を消す
+                db.session.execute(delete(model).where(model.id.in_(ids)), execution_options={'synchronize_session': False})
+                db.session.commit()
+        click.echo(f'{department} → {health_shards.shard_name(department)}: {moved} 件')
+
+    # 社員の現在のシャード以外に残った記録を移す（異動先に同じ記録があればコピーせずに消す）
+    departments_by_user = dict(db.session.query(User.id, User.department))
+    for name in health_shards.shard_names():
+        source = health_shards.shard_session(name)
+        user_ids = set()
+        for model in moved_models():
+            user_ids.update(source.scalars(select(model.user_id).distinct()))
+        for user_id in sorted(user_ids):
+            if user_id not in departments_by_user:
+                continue  # 削除した社員のアーカイブはそのまま残す
+            department = departments_by_user[user_id]
+            if health_shards.shard_name(department) == name:
+                continue
+            target = health_shards.session_for(department)
+            moved = sum(
+                copy_rows(source, target, model, model.user_id == user_id, skip_existing=True)
+                for model in moved_models()
+            )
+            target.commit()
+            delete_user_records(source, user_id, record_changes=False)
+            source.commit()
+            click.echo(f'{name} → {health_shards.shard_name(department)}: 社員 {user_id} の残りの記録 {moved} 件')
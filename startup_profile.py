@@ -0,0 +1,141 @@
+# startup_profile.py
+"""ワーカーの起動時間（import と create_app）の計測と予算のチェック
+
+毎回新しいプロセスで起動し、-X importtime の結果から読み込みに時間のかかるモジュールを表示する。
+--check を付けると、起動時間の中央値が予算を超えた場合や、
+起動時に読み込まないことにしているモジュール（DEFERRED_MODULES）が読み込まれた場合に終了コード 1 で終了する。
+
+    python startup_profile.py [--repeat 5] [--top 15]
+    python startup_profile.py --check [--budget-ms 1000] [--cli-budget-ms 900]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 起動の種類と create_app の引数（web: gunicorn のワーカー、cli: ジョブのワーカー・CLI・テストデータの登録）
+SCENARIOS = {
+    'web': {},
+    'cli': {'web': False},
+}
+
+# 起動時の予算（ミリ秒。環境変数で変更できる）
+DEFAULT_BUDGETS = {
+    'web': int(os.environ.get('STARTUP_BUDGET_MS', 1000)),
+    'cli': int(os.environ.get('STARTUP_CLI_BUDGET_MS', 900)),
+}
+
+# 起動時には読み込まず、初めて使うときに読み込むモジュール
+DEFERRED_MODULES = {
+    'web': [
+        'alembic', 'flask_migrate',  # flask db の実行時のみ
+        'wtforms', 'flask_wtf', 'email_validator',  # フォームの画面を開いたとき
+        'concurrent.futures.process', 'multiprocessing',  # 最初のジョブの登録時
+        'pytz', 'sqlalchemy.dialects.postgresql',
+    ],
+}
+DEFERRED_MODULES['cli'] = DEFERRED_MODULES['web'] + ['routes', 'forms']
+
+# 子プロセスで実行するコード（import と create_app の時間、読み込まれたモジュールを JSON で出力する）
+CHILD_CODE = '''
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app(**{kwargs})
+created = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - start) * 1000,
+    'create_ms': (created - imported) * 1000,
+    'modules': sorted(sys.modules),
+}}))
+'''
+
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def run_once(scenario):
+    """新しいプロセスで1回起動し、(計測結果, importtime の行) を返す"""
+    env = dict(os.environ, SECRET_KEY=os.environ.get('SECRET_KEY', 'startup-profile'))
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD_CODE.format(kwargs=repr(SCENARIOS[scenario]))],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    imports = []
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            imports.append((match.group(4), len(match.group(3)) // 2, int(match.group(1)), int(match.group(2))))
+    return json.loads(completed.stdout.strip().splitlines()[-1]), imports
+
+
+def top_packages(imports, top):
+    """トップレベルのパッケージごとの読み込み時間（自身の時間の合計、ミリ秒）"""
+    totals = {}
+    for name, _, self_us, _ in imports:
+        package = name.split('.', 1)[0]
+        totals[package] = totals.get(package, 0) + self_us
+    return sorted(((us / 1000, package) for package, us in totals.items()), reverse=True)[:top]
+
+
+def profile(scenario, repeat, top):
+    """起動を repeat 回計測して結果を表示し、(起動時間の中央値, 読み込まれた遅延モジュール) を返す"""
+    results = [run_once(scenario) for _ in range(repeat)]
+    totals = [result['import_ms'] + result['create_ms'] for result, _ in results]
+    median = statistics.median(totals)
+    print(f'[{scenario}] 起動時間 中央値 {median:.0f} ms（import {statistics.median(r["import_ms"] for r, _ in results):.0f} ms'
+          f' + create_app {statistics.median(r["create_ms"] for r, _ in results):.0f} ms、最小 {min(totals):.0f} ms、{repeat} 回）')
+
+    # 最後の1回の importtime から、時間のかかるパッケージと、このアプリケーションのモジュールを表示する
+    _, imports = results[-1]
+    print('  パッケージ別（自身の読み込み時間の合計）:')
+    for ms, package in top_packages(imports, top):
+        print(f'    {ms:8.1f} ms  {package}')
+    local_modules = {
+        os.path.splitext(name)[0] for name in os.listdir(BASE_DIR) if name.endswith('.py')
+    }
+    print('  アプリケーションのモジュール（依存を含む読み込み時間）:')
+    for name, _, _, cumulative_us in sorted(imports, key=lambda item: -item[3]):
+        if name in local_modules:
+            print(f'    {cumulative_us / 1000:8.1f} ms  {name}')
+
+    loaded = set(results[-1][0]['modules'])
+    deferred = [name for name in DEFERRED_MODULES[scenario] if name in loaded]
+    return median, deferred
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ワーカーの起動時間の計測')
+    parser.add_argument('--repeat', type=int, default=5, help='シナリオごとの計測回数')
+    parser.add_argument('--top', type=int, default=15, help='表示するパッケージ数')
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), action='append', help='計測する起動の種類（既定: すべて）')
+    parser.add_argument('--check', action='store_true', help='予算を超えた場合に終了コード 1 で終了する')
+    parser.add_argument('--budget-ms', type=int, default=DEFAULT_BUDGETS['web'], help='web の起動時間の予算')
+    parser.add_argument('--cli-budget-ms', type=int, default=DEFAULT_BUDGETS['cli'], help='cli の起動時間の予算')
+    args = parser.parse_args()
+
+    budgets = {'web': args.budget_ms, 'cli': args.cli_budget_ms}
+    failures = []
+    for scenario in args.scenario or list(SCENARIOS):
+        median, deferred = profile(scenario, args.repeat, args.top)
+        if median > budgets[scenario]:
+            failures.append(f'[{scenario}] 起動時間 {median:.0f} ms が予算 {budgets[scenario]} ms を超えています')
+        if deferred:
+            failures.append(f'[{scenario}] 起動時に読み込まないモジュールが読み込まれています: {", ".join(deferred)}')
+        print()
+
+    for failure in failures:
+        print(failure)
+    if args.check:
+        if failures:
+            sys.exit(1)
+        print('起動時間は予算内です。')
+
+
+if __name__ == '__main__':
+    main()
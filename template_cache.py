@@ -0,0 +1,90 @@
+# template_cache.py
+import os
+from collections import OrderedDict
+from threading import Lock
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+
+class FragmentCache:
+    """描画済みフラグメントを保持する LRU キャッシュ"""
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class FragmentCacheExtension(Extension):
+    """{% cache 'name', key... %} ... {% endcache %} タグ
+
+    テンプレート名と指定したキーの組み合わせごとに描画結果を再利用する。
+    キーには行のデータなど、内容が変わると値も変わるものを指定すること。
+    """
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key_parts = [nodes.Const(parser.name), parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key_parts.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_render_cached', [nodes.List(key_parts)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render_cached(self, key_parts, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        key = tuple(key_parts)
+        rendered = cache.get(key)
+        if rendered is None:
+            rendered = caller()
+            cache.set(key, rendered)
+        return rendered
+
+
+class TemplateCache:
+    """Jinja のバイトコードキャッシュとフラグメントキャッシュを設定する"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('JINJA_BYTECODE_CACHE_DIR', os.path.join(app.instance_path, 'jinja_cache'))
+        app.config.setdefault('FRAGMENT_CACHE_SIZE', 5000)
+
+        # コンパイル済みテンプレートをファイルに保存し、ワーカー起動時の再コンパイルを省く
+        cache_dir = app.config['JINJA_BYTECODE_CACHE_DIR']
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        # デバッグ時はテンプレートの変更をすぐ反映させるため、フラグメントはキャッシュしない
+        if not app.debug:
+            app.jinja_env.fragment_cache = FragmentCache(app.config['FRAGMENT_CACHE_SIZE'])
+        app.extensions['template_cache'] = self
@@ -1,11 +1,12 @@
 # test_data.py
 import random
-from app import db, app
+from app import create_app
+from extensions import db, health_shards
 from models import User, HealthRecord, Department, Announcement
 from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash
 
-import pytz 
+from zoneinfo import ZoneInfo
 # テストデータの生成
 departments = ['hr', 'it', 'sales', 'marketing', 'finance']
 names = [
@@ -39,7 +40,7 @@ names = [
 # 社員データの登録
 def create_test_data():
     # 日本のタイムゾーンを設定
-    tz = pytz.timezone('Asia/Tokyo')
+    tz = ZoneInfo('Asia/Tokyo')
     
     with open('employee_data.txt', 'w', encoding='utf-8') as f:
         for i in range(200):
@@ -64,6 +65,7 @@ def create_test_data():
             db.session.add(user)
             db.session.commit()
 
+            health_session = health_shards.session_for(department)  # 体調記録は部署のシャードに保存
             for day in range(90):
                 record_date = datetime.now(tz) - timedelta(days=day + 1)  # タイムゾーンを考慮して日付を生成
                 Healthflag=0
@@ -90,9 +92,9 @@ def create_test_data():
                     date=record_date,
                     flag=Healthflag
                 )
-                db.session.add(health_record)
+                health_session.add(health_record)
 
-            db.session.commit()
+            health_session.commit()
             
             f.write(f"社員番号: {employee_number}, 名前: {name}, 部署: {department}, "
                     f"電話: {phone}, メール: {email}\n")
@@ -121,7 +123,7 @@ def insert_initial_departments():
 
 def creat_announcement_data():
     # 日本のタイムゾーンを設定
-    tz = pytz.timezone('Asia/Tokyo')
+    tz = ZoneInfo('Asia/Tokyo')
 
     title = [
         "年末年始休業のお知らせ",
@@ -169,6 +171,7 @@ def creat_announcement_data():
 
 
 if __name__ == '__main__':
+    app = create_app(web=False)
     with app.app_context():  # アプリケーションコンテキストを設定
         insert_initial_departments()  # 初期データの部門登録
         create_test_data()  # テストデータの社員登録
@@ -0,0 +1,20 @@
+# tests/test_startup_profile.py
+"""ワーカーの起動時間の予算と遅延読み込みのチェック（startup_profile.py --check と同じ条件）"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import startup_profile  # noqa: E402
+
+REPEAT = int(os.environ.get('STARTUP_PROFILE_REPEAT', 3))
+
+
+@pytest.mark.parametrize('scenario', sorted(startup_profile.SCENARIOS))
+def test_startup_within_budget(scenario):
+    median, deferred = startup_profile.profile(scenario, REPEAT, top=5)
+    budget = startup_profile.DEFAULT_BUDGETS[scenario]
+    assert median <= budget, f'[{scenario}] 起動時間 {median:.0f} ms が予算 {budget} ms を超えています'
+    assert not deferred, f'[{scenario}] 起動時に読み込まないモジュールが読み込まれています: {", ".join(deferred)}'
@@ -0,0 +1,68 @@
+# timeseries.py
+from datetime import date, timedelta
+
+# グラフ1本あたりの最大ポイント数（期間に関係なくペイロードをこの範囲に収める）
+MAX_POINTS = 120
+
+# 細かい順に並べた解像度
+RESOLUTIONS = ('day', 'week', 'month')
+
+
+def bucket_key(day, resolution):
+    """日付をバケットの代表ラベルに変換"""
+    if resolution == 'week':
+        # ISO週の月曜日をラベルにする
+        return (day - timedelta(days=day.weekday())).strftime('%Y-%m-%d')
+    if resolution == 'month':
+        return day.strftime('%Y-%m')
+    return day.strftime('%Y-%m-%d')
+
+
+def count_buckets(labels, resolution):
+    """指定した解像度でのバケット数を数える"""
+    return len({bucket_key(date.fromisoformat(label), resolution) for label in labels})
+
+
+def choose_resolution(labels, requested='auto', max_points=MAX_POINTS):
+    """要求された解像度を、ポイント数が上限に収まる最も細かい解像度に補正する"""
+    if requested not in RESOLUTIONS:
+        requested = 'day'
+    for resolution in RESOLUTIONS[RESOLUTIONS.index(requested):]:
+        if count_buckets(labels, resolution) <= max_points:
+            return resolution
+    return RESOLUTIONS[-1]
+
+
+def downsample(labels, series, resolution):
+    """日次系列をバケットごとの平均・最小・最大に集約する
+
+    labels: 'YYYY-MM-DD' の日付ラベル
+    series: labels と同じ長さの値リスト（欠損は None）
+    戻り値: (バケットラベル, 平均, 最小, 最大)
+    """
+    if resolution == 'day':
+        return list(labels), list(series), list(series), list(series)
+
+    bucket_labels = []
+    buckets = {}
+    for label, value in zip(labels, series):
+        key = bucket_key(date.fromisoformat(label), resolution)
+        if key not in buckets:
+            bucket_labels.append(key)
+            buckets[key] = []
+        if value is not None:
+            buckets[key].append(value)
+
+    means, mins, maxs = [], [], []
+    for key in bucket_labels:
+        values = buckets[key]
+        if values:
+            means.append(round(sum(values) / len(values), 2))
+            mins.append(min(values))
+            maxs.append(max(values))
+        else:
+            # データがないバケットは欠損として扱う
+            means.append(None)
+            mins.append(None)
+            maxs.append(None)
+    return bucket_labels, means, mins, maxs
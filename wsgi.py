@@ -0,0 +1,8 @@
+# wsgi.py
+"""本番用の WSGI エントリポイント
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+from app import create_app
+
+app = create_app()